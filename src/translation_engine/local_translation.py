@@ -0,0 +1,243 @@
+from typing import Optional, Union
+import re
+import threading
+
+from src.config.config import Config
+from src.translation_engine.registry import register_translator
+from src.translation_engine.translation import Translator
+
+
+# lines of wiki markup that are not prose: templates, tables, files, categories, html tags and magic words
+MARKUP_LINE_PATTERN = re.compile(r"^\s*(?:\{\{|\}\}|\{\||\|\}|\||!|\[\[(?:File|Image|Category):|<|__)")
+HEADING_PATTERN = re.compile(r"^(=+)(.+?)(=+)\s*$")
+LIST_PREFIX_PATTERN = re.compile(r"^[*#:;]*\s*")
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+(?=\S)")
+# masks of links and references, and the literal placeholders of the text, e.g. [1], that are protected as masks
+PROTECTED_PATTERN = re.compile(r"\[\[(LINK\d+)\|(.+?)\]\]|<REF\d+>|\[\d+\]")
+PLACEHOLDER_PATTERN = re.compile(r"\[(\d+)\]")
+
+
+@register_translator("ctranslate2")
+class CTranslate2Translator(Translator):
+    """
+    Local translator running CTranslate2 models (e.g. converted Marian/OPUS-MT models) on the CPU. The text is split
+    in sentences that are translated in batches, the masks of links and references are replaced by numbered
+    placeholders during the translation so they are kept intact. The text that already looks like a placeholder is
+    protected the same way.
+    """
+
+    def __init__(self, models: dict[str, Union[str, dict]], device: str = "cpu", inter_threads: int = 1,
+                 intra_threads: int = 0, max_batch_size: int = 32, beam_size: int = 2,
+                 config: Optional[Config] = None):
+        """
+        Constructor class
+        :param models: dictionary from the language pair (e.g. "en-pt") to the model directory, or to a dictionary with
+        the "path" of the model and an optional "source_prefix" token for multilingual models (e.g. ">>pt<<"). The
+        directory contains the converted model and its source.spm and target.spm sentencepiece models.
+        :param device: device to run the models on
+        :param inter_threads: number of batches translated in parallel
+        :param intra_threads: number of threads used by each batch, 0 lets CTranslate2 decide
+        :param max_batch_size: maximum number of sentences per batch
+        :param beam_size: beam size of the decoding
+        :param config: configuration object, not used by this backend
+        """
+
+        try:
+            import ctranslate2
+            import sentencepiece
+        except ImportError as e:
+            raise ImportError("The ctranslate2 translator backend requires the ctranslate2 and sentencepiece "
+                              "packages") from e
+
+        self.ctranslate2 = ctranslate2
+        self.sentencepiece = sentencepiece
+        self.models = {language_pair: model if isinstance(model, dict) else {"path": model}
+                       for language_pair, model in models.items()}
+        self.device = device
+        self.inter_threads = inter_threads
+        self.intra_threads = intra_threads
+        self.max_batch_size = max_batch_size
+        self.beam_size = beam_size
+
+        # models are loaded the first time their language pair is used
+        self.loaded_models = {}
+        self.lock = threading.Lock()
+
+    def load_model(self, source_language: str, target_language: str) -> tuple:
+        """
+        Load the model of a language pair
+        :param source_language: source language code
+        :param target_language: target language code
+        :return: tuple containing the translator, the source and target sentencepiece models and the source prefix
+        """
+
+        language_pair = f"{source_language}-{target_language}"
+        with self.lock:
+            if language_pair not in self.loaded_models:
+                if language_pair not in self.models:
+                    raise ValueError(f"No local model for the language pair {language_pair}")
+
+                model = self.models[language_pair]
+                path = model["path"]
+                translator = self.ctranslate2.Translator(path, device=self.device, inter_threads=self.inter_threads,
+                                                         intra_threads=self.intra_threads)
+                source_model = self.sentencepiece.SentencePieceProcessor(model_file=f"{path}/source.spm")
+                target_model = self.sentencepiece.SentencePieceProcessor(model_file=f"{path}/target.spm")
+                self.loaded_models[language_pair] = (translator, source_model, target_model,
+                                                     model.get("source_prefix"))
+
+            return self.loaded_models[language_pair]
+
+    def translate_sentences(self, sentences: list[str], source_language: str, target_language: str) -> list[str]:
+        """
+        Translate a list of sentences with batched inference
+        :param sentences: sentences to translate
+        :param source_language: source language code
+        :param target_language: target language code
+        :return: translated sentences
+        """
+
+        if len(sentences) == 0:
+            return []
+
+        translator, source_model, target_model, source_prefix = self.load_model(source_language, target_language)
+
+        tokens = source_model.encode(sentences, out_type=str)
+        if source_prefix is not None:
+            tokens = [[source_prefix] + sentence_tokens for sentence_tokens in tokens]
+
+        results = translator.translate_batch(tokens, max_batch_size=self.max_batch_size, beam_size=self.beam_size)
+        return [target_model.decode(result.hypotheses[0]) for result in results]
+
+    def perform_translation(self, text: str, source_language: str = "en", target_language: str = "pt",
+                            translation_type: str = "text") -> str:
+        """
+        Execute the translation
+        :param text: given text
+        :param source_language: source language code, default is en
+        :param target_language: target language code, default is pt
+        :param translation_type: content to translate
+        :return: translated text
+        """
+
+        if translation_type == "title":
+            return self.translate_sentences([text], source_language, target_language)[0]
+
+        # collect the sentences of every prose line, the markup lines are kept as they are
+        lines = text.split("\n")
+        sentences = []
+        masks = []
+        layout = []
+        for line in lines:
+            heading = HEADING_PATTERN.match(line)
+            if line.strip() == "" or MARKUP_LINE_PATTERN.match(line):
+                layout.append(("markup", line))
+            elif heading is not None:
+                layout.append(("heading", heading, len(sentences)))
+                sentence, sentence_masks = self.protect_masks(heading.group(2).strip())
+                sentences.append(sentence)
+                masks.append(sentence_masks)
+            else:
+                # the list markers are kept out of the translation
+                prefix = LIST_PREFIX_PATTERN.match(line).group(0)
+                parts = SENTENCE_PATTERN.split(line[len(prefix):])
+                layout.append(("prose", len(sentences), len(parts), prefix))
+                for part in parts:
+                    sentence, sentence_masks = self.protect_masks(part)
+                    sentences.append(sentence)
+                    masks.append(sentence_masks)
+
+        # the labels of the links are translated in the same batch as the sentences
+        labels = [label for sentence_masks in masks for _, label in sentence_masks if label is not None]
+        translations = self.translate_sentences(sentences + labels, source_language, target_language)
+        translated_labels = iter(translations[len(sentences):])
+
+        restored = []
+        for sentence_masks, translation in zip(masks, translations[:len(sentences)]):
+            restored.append(self.restore_masks(translation, sentence_masks, translated_labels))
+
+        # rebuild the text line by line
+        translated_lines = []
+        for entry in layout:
+            if entry[0] == "markup":
+                translated_lines.append(entry[1])
+            elif entry[0] == "heading":
+                heading = entry[1]
+                translated_lines.append(f"{heading.group(1)} {restored[entry[2]]} {heading.group(3)}")
+            else:
+                translated_lines.append(entry[3] + " ".join(restored[entry[1]:entry[1] + entry[2]]))
+
+        return "\n".join(translated_lines)
+
+    def perform_batch_translation(self, texts: list[str], source_language: str = "en", target_language: str = "pt",
+                                  translation_type: str = "title") -> list[Optional[str]]:
+        """
+        Execute the translation of several short texts in a single batch
+        :param texts: list of texts to translate
+        :param source_language: source language code, default is en
+        :param target_language: target language code, default is pt
+        :param translation_type: content to translate
+        :return: list of translations in the same order as the texts
+        """
+
+        if translation_type != "title":
+            return [self.perform_translation(text, source_language, target_language, translation_type)
+                    for text in texts]
+        return self.translate_sentences(texts, source_language, target_language)
+
+    @staticmethod
+    def protect_masks(sentence: str) -> tuple[str, list[tuple[str, Optional[str]]]]:
+        """
+        Replace the masks of a sentence by numbered placeholders. The literal placeholders of the sentence are replaced
+        too, so every placeholder of the translation is one of the masks.
+        :param sentence: masked sentence
+        :return: tuple containing the sentence with placeholders and the list of (mask, link label) of each placeholder,
+        the label is None for references and literal placeholders
+        """
+
+        masks = []
+
+        def protect(match: re.Match) -> str:
+            if match.group(1) is not None:
+                masks.append((match.group(1), match.group(2)))
+            else:
+                masks.append((match.group(0), None))
+            return f"[{len(masks) - 1}]"
+
+        return PROTECTED_PATTERN.sub(protect, sentence), masks
+
+    @staticmethod
+    def restore_masks(translation: str, masks: list[tuple[str, Optional[str]]], translated_labels) -> str:
+        """
+        Put the masks back in a translated sentence. Placeholders lost by the model are appended to the end of the
+        sentence and repeated placeholders are removed, so every mask appears exactly once.
+        :param translation: translated sentence with placeholders
+        :param masks: list of (mask, link label) of each placeholder
+        :param translated_labels: iterator over the translated labels of the links, in the order of the masks
+        :return: translated sentence with the masks
+        """
+
+        restored_masks = []
+        for mask, label in masks:
+            if label is None:
+                restored_masks.append(mask)
+            else:
+                restored_masks.append(f"[[{mask}|{next(translated_labels)}]]")
+
+        used = set()
+
+        def restore(match: re.Match) -> str:
+            index = int(match.group(1))
+            if index >= len(restored_masks):
+                return match.group(0)
+            if index in used:
+                return ""
+            used.add(index)
+            return restored_masks[index]
+
+        translation = PLACEHOLDER_PATTERN.sub(restore, translation)
+        for index, restored_mask in enumerate(restored_masks):
+            if index not in used:
+                translation += restored_mask
+
+        return translation
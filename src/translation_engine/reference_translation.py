@@ -0,0 +1,160 @@
+import re
+from typing import Optional, Tuple
+
+from src.config.config import Config
+from src.utils.wikitext import find_templates, split_template, normalize_template_name
+
+
+class ReferenceTranslator:
+    """
+    Rule based translator of citation templates, translates the references locally without calling a language model
+    """
+
+    def __init__(self, rules: dict):
+        """
+        Compile the translation rules of a language pair
+        :param rules: rules of the language pair, as in the reference_translation entry of the configuration
+        """
+
+        self.templates = {normalize_template_name(name): target for name, target in rules.get("templates", {}).items()}
+        self.parameters = rules.get("parameters", {})
+        self.date_parameters = set(rules.get("date_parameters", []))
+        self.language_parameters = set(rules.get("language_parameters", []))
+        self.language_codes = {name.lower(): code for name, code in rules.get("language_codes", {}).items()}
+        self.date_format = rules.get("date_format", "{year}-{month_number}-{day}")
+        self.month_format = rules.get("month_format", "{month} {year}")
+
+        # months are matched by their full name or their abbreviations, the three first letters if none is given
+        source_months = rules.get("source_months", [])
+        target_months = rules.get("target_months", source_months)
+        abbreviations = rules.get("source_month_abbreviations", {})
+        self.months = {}
+        for number, (source_month, target_month) in enumerate(zip(source_months, target_months), start=1):
+            self.months[source_month.lower()] = (number, target_month)
+            for abbreviation in abbreviations.get(source_month, [source_month[:3]]):
+                self.months[abbreviation.lower()] = (number, target_month)
+
+        month = "|".join(sorted((re.escape(name) for name in self.months), key=len, reverse=True)) or "(?!)"
+        self.date_patterns = [
+            re.compile(rf"^(?P<month>{month})\.? (?P<day>\d{{1,2}}),? (?P<year>\d{{4}})$", re.IGNORECASE),
+            re.compile(rf"^(?P<day>\d{{1,2}}) (?P<month>{month})\.?,? (?P<year>\d{{4}})$", re.IGNORECASE),
+            re.compile(r"^(?P<year>\d{4})-(?P<month_number>\d{2})-(?P<day>\d{2})$"),
+        ]
+        self.month_pattern = re.compile(rf"^(?P<month>{month})\.? (?P<year>\d{{4}})$", re.IGNORECASE)
+        self.target_months = list(target_months)
+
+    @staticmethod
+    def from_config(config: Config) -> dict[Tuple[str, str], "ReferenceTranslator"]:
+        """
+        Compile the reference translators of every language pair in the configuration
+        :param config: configuration object
+        :return: dictionary from the (source language, target language) to its reference translator
+        """
+
+        translators = {}
+        for language_pair, rules in config.config.get("reference_translation", {}).items():
+            source_language, target_language = language_pair.split("-")
+            translators[(source_language, target_language)] = ReferenceTranslator(rules)
+        return translators
+
+    def translate(self, text: str) -> str:
+        """
+        Translate the citation templates within a reference
+        :param text: the entire xml of a reference
+        :return: reference with its citation templates translated
+        """
+
+        translated_text = []
+        position = 0
+        for start, end in find_templates(text):
+            translated_text.append(text[position:start])
+            translated_text.append(self.translate_template(text[start:end]))
+            position = end
+        translated_text.append(text[position:])
+
+        return "".join(translated_text)
+
+    def translate_template(self, template: str) -> str:
+        """
+        Translate a single template, templates without a rule are returned unchanged
+        :param template: the entire template text
+        :return: translated template
+        """
+
+        name, parameters = split_template(template)
+        target_name = self.templates.get(normalize_template_name(name))
+        if target_name is None:
+            return template
+
+        # keep the spacing around the template name
+        raw_name = template[2:-2].split("|")[0]
+        translated = ["{{" + raw_name.replace(name, target_name)]
+        for parameter in parameters:
+            translated.append(self.translate_parameter(parameter))
+
+        return "|".join(translated) + "}}"
+
+    def translate_parameter(self, parameter: str) -> str:
+        """
+        Translate the name and value of a template parameter, positional parameters are returned unchanged
+        :param parameter: raw parameter, in the format name = value
+        :return: translated parameter
+        """
+
+        if "=" not in parameter:
+            return parameter
+
+        raw_name, raw_value = parameter.split("=", 1)
+        name = raw_name.strip()
+        value = raw_value.strip()
+        if value == "":
+            translated_value = raw_value
+        elif name in self.date_parameters:
+            translated_value = raw_value.replace(value, self.translate_date(value))
+        elif name in self.language_parameters:
+            translated_value = raw_value.replace(value, self.language_codes.get(value.lower(), value))
+        else:
+            translated_value = raw_value
+
+        translated_name = raw_name.replace(name, self.parameters.get(name, name)) if name != "" else raw_name
+        return f"{translated_name}={translated_value}"
+
+    def translate_date(self, date: str) -> str:
+        """
+        Translate a date to the date format of the target language, unknown formats are returned unchanged
+        :param date: date as written in the source reference
+        :return: translated date
+        """
+
+        for pattern in self.date_patterns:
+            match = pattern.match(date)
+            if match is not None:
+                month_number, month = self.match_month(match)
+                if month is None:
+                    return date
+                return self.date_format.replace("{day}", str(int(match.group("day")))).\
+                    replace("{month}", month).\
+                    replace("{month_number}", f"{month_number:02d}").\
+                    replace("{year}", match.group("year"))
+
+        match = self.month_pattern.match(date)
+        if match is not None:
+            _, month = self.match_month(match)
+            return self.month_format.replace("{month}", month).replace("{year}", match.group("year"))
+
+        return date
+
+    def match_month(self, match: re.Match) -> Tuple[int, Optional[str]]:
+        """
+        Retrieve the month of a matched date
+        :param match: match of one of the date patterns
+        :return: tuple containing the month number and the month name in the target language
+        """
+
+        if match.groupdict().get("month_number") is not None:
+            month_number = int(match.group("month_number"))
+            if not 1 <= month_number <= len(self.target_months):
+                return month_number, None
+            return month_number, self.target_months[month_number - 1]
+
+        return self.months[match.group("month").lower()]
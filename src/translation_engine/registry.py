@@ -0,0 +1,41 @@
+from src.config.config import Config
+
+
+# translator backends by name, filled by the register_translator decorator
+TRANSLATOR_BACKENDS = {}
+
+
+def register_translator(name: str):
+    """
+    Decorator to register a Translator subclass as a backend selectable in the configuration
+    :param name: name of the backend in the configuration
+    :return: the decorator
+    """
+
+    def decorator(translator_class):
+        TRANSLATOR_BACKENDS[name] = translator_class
+        return translator_class
+
+    return decorator
+
+
+def build_translator(config: Config):
+    """
+    Build the translator backend selected in the "translator" entry of the configuration. The other keys of the entry
+    are given to the constructor of the backend, and its requests running at once are bounded by
+    max_concurrent_requests.
+    :param config: configuration object
+    :return: translator object
+    """
+
+    # the backends register themselves when their module is imported
+    from src.translation_engine import translation, local_translation  # noqa: F401
+
+    settings = dict(config.config.get("translator", {"backend": "chatgpt"}))
+    backend = settings.pop("backend", "chatgpt")
+
+    if backend not in TRANSLATOR_BACKENDS:
+        raise ValueError(f"Translator backend {backend} doesn't exist, available: {sorted(TRANSLATOR_BACKENDS)}")
+
+    return translation.LimitedTranslator(TRANSLATOR_BACKENDS[backend](config=config, **settings),
+                                         config.config.get("max_concurrent_requests", 8))
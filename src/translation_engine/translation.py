@@ -2,6 +2,12 @@ from abc import ABC, abstractmethod
 from openai import OpenAI
 from typing import Optional
 from src.config.config import Config
+from src.translation_engine.registry import register_translator
+from src.translation_engine.usage_metrics import UsageMetrics
+import json
+import logging
+import threading
+import time
 
 
 class Translator(ABC):
@@ -23,7 +29,85 @@ class Translator(ABC):
 
         raise NotImplementedError("Subclasses should implement this!")
 
+    def perform_batch_translation(self, texts: list[str], source_language: str = "english",
+                                  target_language: str = "portuguese",
+                                  translation_type: str = "title") -> list[Optional[str]]:
+        """
+        Execute the translation of several short texts. The default behaviour translates them one by one, subclasses
+        may override it to translate the whole batch in a single request.
+        :param texts: list of texts to translate
+        :param source_language: source language, default is english
+        :param target_language: target language, default is portuguese
+        :param translation_type: content to translate
+        :return: list of translations in the same order as the texts, None where the translation failed
+        """
+
+        return [self.perform_translation(text, source_language, target_language, translation_type) for text in texts]
 
+    def usage_report(self) -> dict:
+        """
+        Report the usage of the translation requests, backends without metrics report nothing
+        :return: dictionary from the translation type to its usage
+        """
+
+        return {}
+
+
+class LimitedTranslator(Translator):
+    """
+    Translator wrapper that bounds the number of requests running at once, shared by every thread translating pages
+    """
+
+    def __init__(self, translator: Translator, max_concurrent_requests: int = 8):
+        """
+        Constructor of the wrapper
+        :param translator: translator backend
+        :param max_concurrent_requests: maximum number of translation requests running at once
+        """
+
+        self.translator = translator
+        self.slots = threading.BoundedSemaphore(max_concurrent_requests)
+
+    def perform_translation(self, text: str, source_language: str = "english", target_language: str = "portuguese",
+                            translation_type: str = "text") -> str:
+        """
+        Execute the translation when a request slot is available
+        :param text: given text
+        :param source_language: source language, default is english
+        :param target_language: target language, default is portuguese
+        :param translation_type: content to translate
+        :return: translated text
+        """
+
+        with self.slots:
+            return self.translator.perform_translation(text, source_language, target_language, translation_type)
+
+    def perform_batch_translation(self, texts: list[str], source_language: str = "english",
+                                  target_language: str = "portuguese",
+                                  translation_type: str = "title") -> list[Optional[str]]:
+        """
+        Execute the translation of several short texts when a request slot is available
+        :param texts: list of texts to translate
+        :param source_language: source language, default is english
+        :param target_language: target language, default is portuguese
+        :param translation_type: content to translate
+        :return: list of translations in the same order as the texts, None where the translation failed
+        """
+
+        with self.slots:
+            return self.translator.perform_batch_translation(texts, source_language, target_language,
+                                                             translation_type)
+
+    def usage_report(self) -> dict:
+        """
+        Report the usage of the translation requests of the backend
+        :return: dictionary from the translation type to its usage
+        """
+
+        return self.translator.usage_report()
+
+
+@register_translator("chatgpt")
 class ChatGPTTranslator(Translator):
     """
     Chat GPT Translator class
@@ -44,10 +128,109 @@ class ChatGPTTranslator(Translator):
         self.client = OpenAI()
 
         self.translation_prompt = {}
+        self.mask_rules = ""
+        self.examples = {}
+        self.terminology = {}
         if config is not None:
             self.translation_prompt = config.config["translation_prompt"]
+            self.mask_rules = config.config.get("mask_rules", "")
+            self.examples = config.config.get("translation_examples", {})
+            self.terminology = config.config.get("terminology", {})
+        if isinstance(self.mask_rules, list):
+            self.mask_rules = "\n".join(self.mask_rules)
 
         self.default_behaviour = "Translate the text from {source_language} to {target_language}."
+        self.default_batch_behaviour = "Translate each text of the JSON array from {source_language} to " \
+                                       "{target_language}. Answer with a JSON object in the format " \
+                                       "{\"translations\": [{\"id\": <id>, \"text\": <translation>}]}, one " \
+                                       "entry per given id."
+
+        # system prompts compiled once by translation type and language pair, so every request of the same kind
+        # starts with the same prefix and the prompt cache of the provider applies
+        self.system_prompts: dict[tuple[str, str, str], str] = {}
+        self.lock = threading.Lock()
+        self.metrics = UsageMetrics()
+
+    def system_prompt(self, translation_type: str, source_language: str, target_language: str) -> str:
+        """
+        Static system prompt of a translation type and language pair: the instructions, the rules of the masks and the
+        examples for the texts and the terminology of the language pair. The provider caches only prompts of at least
+        1024 tokens, the shorter prompts are logged once.
+        :param translation_type: content to translate
+        :param source_language: source language
+        :param target_language: target language
+        :return: the system prompt
+        """
+
+        key = (translation_type, source_language, target_language)
+        with self.lock:
+            if key in self.system_prompts:
+                return self.system_prompts[key]
+
+        default_behaviour = self.default_batch_behaviour if translation_type.endswith("_batch") \
+            else self.default_behaviour
+        parts = [self.translation_prompt.get(translation_type, default_behaviour).
+                 replace("{source_language}", source_language).
+                 replace("{target_language}", target_language)]
+        if translation_type.startswith("text") and self.mask_rules != "":
+            parts.append(self.mask_rules)
+
+        examples = self.examples.get(f"{source_language}-{target_language}", [])
+        if translation_type.startswith("text") and len(examples) > 0:
+            parts.append("Examples:\n" + "\n\n".join(f"Text:\n{example['text']}\nTranslation:\n"
+                                                      f"{example['translation']}" for example in examples))
+
+        terminology = self.terminology.get(f"{source_language}-{target_language}", {})
+        if len(terminology) > 0:
+            parts.append("Use these translations for the following section headings and names, where they are used "
+                         "as such:\n" +
+                         "\n".join(f"{term} => {translation}" for term, translation in sorted(terminology.items())))
+
+        system_prompt = "\n\n".join(parts)
+        with self.lock:
+            if key not in self.system_prompts and len(system_prompt.encode("utf-8")) / 4 < 1024:
+                logging.info(f"The system prompt of {translation_type} ({source_language}-{target_language}) has about "
+                             f"{round(len(system_prompt.encode('utf-8')) / 4)} tokens, below the 1024 tokens of the "
+                             f"prompt cache")
+            return self.system_prompts.setdefault(key, system_prompt)
+
+    def request(self, text: str, source_language: str, target_language: str, translation_type: str,
+                **kwargs) -> str:
+        """
+        Send a translation request, the static system prompt comes first and the text last, and record its usage
+        :param text: content of the user message
+        :param source_language: source language
+        :param target_language: target language
+        :param translation_type: content to translate, selects the system prompt
+        :param kwargs: other parameters of the request, e.g. response_format
+        :return: content of the answer
+        """
+
+        messages = [{"role": "system", "content": self.system_prompt(translation_type, source_language,
+                                                                     target_language)},
+                    {"role": "user", "content": text}]
+
+        start = time.perf_counter()
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=self.temperature,
+            timeout=self.timeout,
+            extra_body={"prompt_cache_key": f"{translation_type}-{source_language}-{target_language}"},
+            **kwargs
+        )
+        seconds = time.perf_counter() - start
+
+        # cached tokens are reported only by the models supporting the prompt cache
+        usage = response.usage
+        if usage is not None:
+            details = getattr(usage, "prompt_tokens_details", None)
+            self.metrics.record(translation_type, seconds, usage.prompt_tokens,
+                                getattr(details, "cached_tokens", None) or 0, usage.completion_tokens)
+        else:
+            self.metrics.record(translation_type, seconds)
+
+        return response.choices[0].message.content
 
     def perform_translation(self, text: str, source_language: str = "english", target_language: str = "portuguese",
                             translation_type: str = "text") -> str:
@@ -60,21 +243,74 @@ class ChatGPTTranslator(Translator):
         :return: translated text
         """
 
-        # build the prompt  message for translation
-        messages = []
-        context = self.translation_prompt.get(translation_type, self.default_behaviour).\
-            replace("{source_language}", source_language).\
-            replace("{target_language}", target_language)
-        messages.append({"role": "system", "content": context})
-        messages.append({"role": "user", "content": text})
+        return self.request(text, source_language, target_language, translation_type)
 
-        # response message
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=messages,
-            temperature=self.temperature,
-            timeout=self.timeout
-        )
+    def perform_batch_translation(self, texts: list[str], source_language: str = "english",
+                                  target_language: str = "portuguese",
+                                  translation_type: str = "title") -> list[Optional[str]]:
+        """
+        Execute the translation of several short texts in a single request. The texts are sent as a JSON array and the
+        model is asked to answer with a JSON object mapping every id to its translation.
+        :param texts: list of texts to translate
+        :param source_language: source language, default is english
+        :param target_language: target language, default is portuguese
+        :param translation_type: content to translate, the prompt used is "{translation_type}_batch"
+        :return: list of translations in the same order as the texts, None where the answer failed validation
+        """
 
-        # output message
-        return response.choices[0].message.content
+        if len(texts) == 0:
+            return []
+
+        # the texts are identified by their position in the batch, the answer is requested in json format
+        batch = json.dumps([{"id": i, "text": text} for i, text in enumerate(texts)], ensure_ascii=False)
+        content = self.request(batch, source_language, target_language, f"{translation_type}_batch",
+                               response_format={"type": "json_object"})
+
+        return self.parse_batch_translation(content, len(texts))
+
+    def usage_report(self) -> dict:
+        """
+        Report the usage of the translation requests: tokens, cached tokens and latency by translation type
+        :return: dictionary from the translation type to its usage
+        """
+
+        return self.metrics.report()
+
+    @staticmethod
+    def parse_batch_translation(content: str, size: int) -> list[Optional[str]]:
+        """
+        Parse and validate the structured answer of a batch translation
+        :param content: json answer of the model, expected as {"translations": [{"id": 0, "text": "..."}, ...]}
+        :param size: number of texts sent in the batch
+        :return: list of translations by id, None for the ids missing, duplicated or invalid in the answer
+        """
+
+        translations: list[Optional[str]] = [None] * size
+        try:
+            items = json.loads(content)["translations"]
+        except (json.JSONDecodeError, KeyError, TypeError):
+            return translations
+
+        if not isinstance(items, list):
+            return translations
+
+        seen = set()
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+
+            element_id = item.get("id")
+            text = item.get("text")
+            if not isinstance(element_id, int) or isinstance(element_id, bool) or not 0 <= element_id < size:
+                continue
+
+            # an id answered twice is ambiguous, so none of its answers is trusted
+            if element_id in seen:
+                translations[element_id] = None
+                continue
+            seen.add(element_id)
+
+            if isinstance(text, str) and text.strip() != "" and "\n" not in text.strip():
+                translations[element_id] = text.strip()
+
+        return translations
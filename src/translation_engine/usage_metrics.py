@@ -0,0 +1,53 @@
+from typing import Optional
+import threading
+
+
+class UsageMetrics:
+    """
+    Class to accumulate the token usage and the latency of the translation requests, by translation type. It is shared
+    by the threads translating the pages.
+    """
+
+    def __init__(self):
+        """
+        Constructor of the usage metrics
+        """
+
+        self.lock = threading.Lock()
+        self.metrics: dict[str, dict[str, float]] = {}
+
+    def record(self, translation_type: str, seconds: float, prompt_tokens: int = 0, cached_tokens: int = 0,
+               completion_tokens: int = 0) -> None:
+        """
+        Record a request
+        :param translation_type: content translated by the request
+        :param seconds: latency of the request
+        :param prompt_tokens: tokens of the prompt
+        :param cached_tokens: tokens of the prompt read from the prompt cache of the provider
+        :param completion_tokens: tokens of the answer
+        :return:
+        """
+
+        with self.lock:
+            metrics = self.metrics.setdefault(translation_type, {"requests": 0, "seconds": 0.0, "prompt_tokens": 0,
+                                                                 "cached_tokens": 0, "completion_tokens": 0})
+            metrics["requests"] += 1
+            metrics["seconds"] += seconds
+            metrics["prompt_tokens"] += prompt_tokens
+            metrics["cached_tokens"] += cached_tokens
+            metrics["completion_tokens"] += completion_tokens
+
+    def report(self) -> dict[str, dict[str, Optional[float]]]:
+        """
+        Report the usage of each translation type
+        :return: dictionary from the translation type to its totals, the mean latency and the share of cached tokens
+        """
+
+        with self.lock:
+            report = {translation_type: dict(metrics) for translation_type, metrics in self.metrics.items()}
+
+        for metrics in report.values():
+            metrics["mean_seconds"] = metrics["seconds"] / metrics["requests"]
+            metrics["cached_ratio"] = metrics["cached_tokens"] / metrics["prompt_tokens"] \
+                if metrics["prompt_tokens"] > 0 else None
+        return report
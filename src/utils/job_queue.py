@@ -0,0 +1,160 @@
+from contextlib import contextmanager
+from typing import Iterator, Optional, Tuple
+import sqlite3
+import time
+
+
+class JobQueue:
+    """
+    Durable queue of pages to translate, stored in a SQLite file that many worker processes on shared storage can claim
+    pages from. A claimed page is leased for a limited time, renewed by heartbeats, and is put back in the queue when
+    its lease expires, e.g. because its worker died.
+    """
+
+    def __init__(self, db_path: str, lease_seconds: float = 300, max_attempts: int = 3, busy_timeout: float = 60):
+        """
+        Constructor of the job queue, creates the queue file if it doesn't exist
+        :param db_path: path of the SQLite file
+        :param lease_seconds: duration of a lease, a worker must send a heartbeat before it expires
+        :param max_attempts: number of claims of a page before it is marked as failed
+        :param busy_timeout: seconds to wait for the lock of the queue file held by another worker
+        """
+
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.busy_timeout = busy_timeout
+
+        with self.connect() as connection:
+            connection.execute("""CREATE TABLE IF NOT EXISTS jobs (
+                                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                                    source_page TEXT NOT NULL,
+                                    source_language TEXT NOT NULL,
+                                    target_page TEXT,
+                                    target_language TEXT NOT NULL,
+                                    priority INTEGER NOT NULL DEFAULT 0,
+                                    status TEXT NOT NULL DEFAULT 'pending',
+                                    worker TEXT,
+                                    lease_expires REAL,
+                                    attempts INTEGER NOT NULL DEFAULT 0,
+                                    error TEXT,
+                                    UNIQUE (source_page, source_language, target_language))""")
+            connection.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, priority, id)")
+
+    @contextmanager
+    def connect(self) -> Iterator[sqlite3.Connection]:
+        """
+        Open a connection to the queue file within an immediate transaction, committed if no error happens
+        :return: the connection
+        """
+
+        connection = sqlite3.connect(self.db_path, timeout=self.busy_timeout, isolation_level=None)
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield connection
+                connection.execute("COMMIT")
+            except BaseException:
+                # the transaction may be already closed, e.g. when the commit itself failed
+                if connection.in_transaction:
+                    connection.execute("ROLLBACK")
+                raise
+        finally:
+            connection.close()
+
+    def enqueue(self, work_list: list[Tuple], priorities: Optional[dict[Tuple, int]] = None) -> int:
+        """
+        Add pages to the queue, the pages already queued are ignored. Pages of the same priority are claimed in the
+        order they are given.
+        :param work_list: list of tuple containing: (source page, source language, target page, target language)
+        :param priorities: dictionary from a work item to its priority class, default class is 0
+        :return: number of pages added
+        """
+
+        if priorities is None:
+            priorities = {}
+
+        with self.connect() as connection:
+            cursor = connection.executemany(
+                "INSERT OR IGNORE INTO jobs (source_page, source_language, target_page, target_language, priority) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(*item, priorities.get(item, 0)) for item in work_list])
+            return cursor.rowcount
+
+    def claim(self, worker_id: str) -> Optional[Tuple[int, Tuple]]:
+        """
+        Claim the next page of the queue, putting back the pages whose lease expired first
+        :param worker_id: id of the worker claiming the page
+        :return: tuple containing the job id and the work item, None if there is no page to claim
+        """
+
+        now = time.time()
+        with self.connect() as connection:
+            connection.execute("UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                               "worker = NULL, error = 'lease expired' "
+                               "WHERE status = 'leased' AND lease_expires < ?", (self.max_attempts, now))
+
+            row = connection.execute("SELECT id, source_page, source_language, target_page, target_language "
+                                     "FROM jobs WHERE status = 'pending' ORDER BY priority, id LIMIT 1").fetchone()
+            if row is not None:
+                connection.execute("UPDATE jobs SET status = 'leased', worker = ?, lease_expires = ?, "
+                                   "attempts = attempts + 1 WHERE id = ?",
+                                   (worker_id, now + self.lease_seconds, row[0]))
+
+        if row is None:
+            return None
+        return row[0], tuple(row[1:])
+
+    def heartbeat(self, job_id: int, worker_id: str) -> bool:
+        """
+        Renew the lease of a claimed page
+        :param job_id: id of the job
+        :param worker_id: id of the worker holding the lease
+        :return: True if the lease was renewed, False if the worker lost it
+        """
+
+        with self.connect() as connection:
+            cursor = connection.execute("UPDATE jobs SET lease_expires = ? "
+                                        "WHERE id = ? AND worker = ? AND status = 'leased'",
+                                        (time.time() + self.lease_seconds, job_id, worker_id))
+            return cursor.rowcount == 1
+
+    def complete(self, job_id: int, worker_id: str) -> bool:
+        """
+        Mark a claimed page as done
+        :param job_id: id of the job
+        :param worker_id: id of the worker holding the lease
+        :return: True if the page was marked, False if the worker lost the lease
+        """
+
+        with self.connect() as connection:
+            cursor = connection.execute("UPDATE jobs SET status = 'done', worker = NULL, error = NULL "
+                                        "WHERE id = ? AND worker = ? AND status = 'leased'", (job_id, worker_id))
+            return cursor.rowcount == 1
+
+    def fail(self, job_id: int, worker_id: str, error: str) -> bool:
+        """
+        Give back a claimed page that failed, it is queued again until it reaches the maximum number of attempts
+        :param job_id: id of the job
+        :param worker_id: id of the worker holding the lease
+        :param error: description of the error
+        :return: True if the page was given back, False if the worker lost the lease
+        """
+
+        with self.connect() as connection:
+            cursor = connection.execute("UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' "
+                                        "ELSE 'pending' END, worker = NULL, error = ? "
+                                        "WHERE id = ? AND worker = ? AND status = 'leased'",
+                                        (self.max_attempts, error, job_id, worker_id))
+            return cursor.rowcount == 1
+
+    def counts(self) -> dict[str, int]:
+        """
+        Number of pages by status
+        :return: dictionary from the status (pending, leased, done, failed) to the number of pages
+        """
+
+        with self.connect() as connection:
+            counts = {"pending": 0, "leased": 0, "done": 0, "failed": 0}
+            counts.update(dict(connection.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()))
+            return counts
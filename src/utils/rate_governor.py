@@ -0,0 +1,31 @@
+import threading
+import time
+
+
+class RateGovernor:
+    """
+    Class to limit the rate of requests, shared between threads
+    """
+
+    def __init__(self, min_interval: float):
+        """
+        Constructor of the rate governor
+        :param min_interval: minimum interval in seconds between two requests
+        """
+
+        self.min_interval = min_interval
+        self.lock = threading.Lock()
+        self.next_request = 0.0
+
+    def wait(self) -> None:
+        """
+        Block until the next request is allowed
+        :return:
+        """
+
+        with self.lock:
+            now = time.monotonic()
+            if self.next_request > now:
+                time.sleep(self.next_request - now)
+                now = self.next_request
+            self.next_request = now + self.min_interval
@@ -0,0 +1,118 @@
+from typing import Optional, Tuple
+import threading
+
+
+class CostEstimator:
+    """
+    Class to estimate the processing time of a page from its cheap metadata
+    """
+
+    def __init__(self, base_seconds: float = 2.0, seconds_per_token: float = 0.01, seconds_per_link: float = 0.02,
+                 seconds_per_reference: float = 0.002, bytes_per_token: float = 4.0):
+        """
+        Constructor of the cost estimator
+        :param base_seconds: fixed time of any page
+        :param seconds_per_token: time per estimated token of the page
+        :param seconds_per_link: time per link of the page
+        :param seconds_per_reference: time per reference of the page
+        :param bytes_per_token: average number of bytes of a token, to estimate the tokens from the byte length
+        """
+
+        self.base_seconds = base_seconds
+        self.seconds_per_token = seconds_per_token
+        self.seconds_per_link = seconds_per_link
+        self.seconds_per_reference = seconds_per_reference
+        self.bytes_per_token = bytes_per_token
+
+    def estimate(self, metadata: dict) -> float:
+        """
+        Estimate the processing time of a page
+        :param metadata: dictionary with the length in bytes, and the links and references counts of the page
+        :return: estimated time in seconds
+        """
+
+        tokens = metadata.get("length", 0) / self.bytes_per_token
+        return self.base_seconds + tokens * self.seconds_per_token + \
+            metadata.get("links", 0) * self.seconds_per_link + \
+            metadata.get("references", 0) * self.seconds_per_reference
+
+
+class WorkScheduler:
+    """
+    Class to order a work list by estimated cost, longest processing time first, by priority class and fairly between
+    the target languages. It also reports the predicted against the actual duration of each page.
+    """
+
+    def __init__(self, estimator: CostEstimator):
+        """
+        Constructor of the scheduler
+        :param estimator: cost estimator of the pages
+        """
+
+        self.estimator = estimator
+        self.predictions: dict[Tuple, float] = {}
+        self.durations: dict[Tuple, float] = {}
+        self.lock = threading.Lock()
+
+    def schedule(self, work_list: list[Tuple], metadata: dict[Tuple, dict],
+                 priorities: Optional[dict[Tuple, int]] = None) -> list[Tuple]:
+        """
+        Order the work list. The priority classes are processed in ascending order; within a class, the next page is
+        the most expensive one of the target language with the least estimated time scheduled so far.
+        :param work_list: list of tuple containing: (source page, source language, target page, target language)
+        :param metadata: dictionary from a work item to its metadata, as given to CostEstimator.estimate
+        :param priorities: dictionary from a work item to its priority class, default class is 0
+        :return: the ordered work list
+        """
+
+        if priorities is None:
+            priorities = {}
+
+        classes: dict[int, dict[str, list[Tuple]]] = {}
+        for item in work_list:
+            self.predictions[item] = self.estimator.estimate(metadata.get(item, {}))
+            target_language = item[3]
+            classes.setdefault(priorities.get(item, 0), {}).setdefault(target_language, []).append(item)
+
+        ordered_work_list = []
+        for priority in sorted(classes):
+            queues = {language: sorted(items, key=lambda item: self.predictions[item], reverse=True)
+                      for language, items in classes[priority].items()}
+            scheduled_cost = {language: 0.0 for language in queues}
+
+            while len(queues) > 0:
+                language = min(queues, key=lambda lang: (scheduled_cost[lang], -self.predictions[queues[lang][0]]))
+                item = queues[language].pop(0)
+                scheduled_cost[language] += self.predictions[item]
+                ordered_work_list.append(item)
+                if len(queues[language]) == 0:
+                    del queues[language]
+
+        return ordered_work_list
+
+    def record_duration(self, item: Tuple, seconds: float) -> None:
+        """
+        Record the actual duration of a page
+        :param item: work item
+        :param seconds: actual duration in seconds
+        :return:
+        """
+
+        with self.lock:
+            self.durations[item] = seconds
+
+    def report(self) -> dict:
+        """
+        Report the predicted against the actual durations, to tune the estimator
+        :return: dictionary with the rows of each processed page, the total predicted and actual durations and the
+        ratio between them, by which the estimator coefficients should be multiplied
+        """
+
+        with self.lock:
+            rows = [{"item": item, "predicted": self.predictions.get(item, 0.0), "actual": seconds}
+                    for item, seconds in self.durations.items()]
+
+        predicted = sum(row["predicted"] for row in rows)
+        actual = sum(row["actual"] for row in rows)
+        return {"rows": rows, "predicted": predicted, "actual": actual,
+                "ratio": actual / predicted if predicted > 0 else None}
@@ -5,9 +5,11 @@ import json
 
 def read_input_file(input_file: str) -> list[Tuple]:
     """
-    Reads the input file if it exists and convert the format to a list of tuple. File format separated by tabs
+    Reads the input file if it exists and convert the format to a list of tuple. File format separated by tabs, an
+    optional fifth column holds the priority class of the page, read by read_priorities
     :param input_file: file to read from
-    :return: list of tuple containing: (source page, source language, target page, target language).
+    :return: list of tuple containing: (source page, source language, target page, target language). The target page
+    is None when it is left empty in the file.
     """
 
     if not os.path.isfile(input_file):
@@ -15,11 +17,29 @@ def read_input_file(input_file: str) -> list[Tuple]:
 
     pages = []
     for line in open(input_file, "r").readlines():
-        source_page, source_language, target_page, target_language = line.split("\t")
-        pages.append((source_page, source_language, target_page, target_language))
+        source_page, source_language, target_page, target_language = line.rstrip("\n").split("\t")[:4]
+        pages.append((source_page, source_language, target_page or None, target_language.strip()))
     return pages
 
 
+def read_priorities(input_file: str) -> dict[Tuple, int]:
+    """
+    Reads the priority classes of the input file, given in its optional fifth column
+    :param input_file: file to read from
+    :return: dictionary from (source page, source language, target language) to the priority class of the page
+    """
+
+    if not os.path.isfile(input_file):
+        raise FileNotFoundError(f"File {input_file} doesn't exist")
+
+    priorities = {}
+    for line in open(input_file, "r").readlines():
+        columns = line.rstrip("\n").split("\t")
+        if len(columns) > 4 and columns[4].strip() != "":
+            priorities[(columns[0], columns[1], columns[3].strip())] = int(columns[4])
+    return priorities
+
+
 def persist_page(page_content: dict, destination_path: str):
     """
     Persist page to a file
@@ -35,3 +55,21 @@ def persist_page(page_content: dict, destination_path: str):
     fout = open(f"{destination_path}/{title}.json", "w")
     fout.write(json.dumps(page_content))
     fout.close()
+
+
+def read_persisted_pages(destination_path: str) -> list[dict]:
+    """
+    Read the pages persisted in a directory
+    :param destination_path: directory where the pages were persisted
+    :return: list of the content of the pages as dictionaries, empty if the directory doesn't exist yet
+    """
+
+    if not os.path.isdir(destination_path):
+        return []
+
+    pages = []
+    for file_name in sorted(os.listdir(destination_path)):
+        if file_name.endswith(".json"):
+            with open(os.path.join(destination_path, file_name), "r") as fin:
+                pages.append(json.loads(fin.read()))
+    return pages
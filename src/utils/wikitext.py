@@ -0,0 +1,74 @@
+from typing import Tuple
+
+
+def find_templates(text: str) -> list[Tuple[int, int]]:
+    """
+    Find the outermost templates ({{...}}) of a wiki text, nested templates are part of their enclosing template
+    :param text: wiki text to look for templates
+    :return: list of tuples containing the (start, end) position of each template in the text
+    """
+
+    templates = []
+    depth = 0
+    start = 0
+    i = 0
+    while i < len(text) - 1:
+        pair = text[i:i + 2]
+        if pair == "{{":
+            if depth == 0:
+                start = i
+            depth += 1
+            i += 2
+        elif pair == "}}" and depth > 0:
+            depth -= 1
+            i += 2
+            if depth == 0:
+                templates.append((start, i))
+        else:
+            i += 1
+
+    return templates
+
+
+def split_template(template: str) -> Tuple[str, list[str]]:
+    """
+    Split a template in its name and its parameters, pipes inside nested templates and links are not split
+    :param template: the entire template text, including the braces
+    :return: tuple containing the template name and the list of raw parameters
+    """
+
+    content = template[2:-2]
+    parts = []
+    depth = 0
+    current = 0
+    i = 0
+    while i < len(content):
+        pair = content[i:i + 2]
+        if pair in ("{{", "[["):
+            depth += 1
+            i += 2
+        elif pair in ("}}", "]]") and depth > 0:
+            depth -= 1
+            i += 2
+        elif content[i] == "|" and depth == 0:
+            parts.append(content[current:i])
+            current = i + 1
+            i += 1
+        else:
+            i += 1
+    parts.append(content[current:])
+
+    return parts[0].strip(), parts[1:]
+
+
+def normalize_template_name(name: str) -> str:
+    """
+    Normalize a template name to compare names written in different ways, e.g. "Cite_web" and "cite  web"
+    :param name: template name
+    :return: normalized template name
+    """
+
+    name = " ".join(name.replace("_", " ").split())
+    if name.lower().startswith("template:"):
+        name = name[len("template:"):].strip()
+    return name[:1].upper() + name[1:]
@@ -0,0 +1,102 @@
+import pywikibot
+
+from typing import Optional
+
+
+def query_pages(site: pywikibot.site.APISite, titles: list[str], batch_size: int = 50,
+                **params) -> dict[str, Optional[dict]]:
+    """
+    Query the API for many pages at once, batch_size titles per request, following the continuations and redirects
+    :param site: wiki site object
+    :param titles: titles of the pages to query
+    :param batch_size: maximum number of titles per request
+    :param params: parameters of the query, e.g. prop="langlinks"
+    :return: dictionary from each requested title to its page in the answer, None if the page doesn't exist
+    """
+
+    pages = {}
+    titles = list(dict.fromkeys(titles))
+    for i in range(0, len(titles), batch_size):
+        batch = titles[i:i + batch_size]
+        request_params = dict(params)
+        responses = []
+        while True:
+            response = site.simple_request(action="query", titles=batch, redirects=True, formatversion=2,
+                                           **request_params).submit()
+            responses.append(response)
+            if "continue" not in response:
+                break
+            request_params.update(response["continue"])
+
+        pages.update(parse_query_pages(responses, batch))
+
+    return pages
+
+
+def parse_query_pages(responses: list[dict], titles: list[str]) -> dict[str, Optional[dict]]:
+    """
+    Merge the answers of a query and its continuations and map them back to the requested titles
+    :param responses: json answers of the query, in formatversion 2
+    :param titles: requested titles
+    :return: dictionary from each requested title to its page in the answer, None if the page doesn't exist
+    """
+
+    pages = {}
+    renames = {}
+    for response in responses:
+        query = response.get("query", {})
+        for rename in query.get("normalized", []) + query.get("redirects", []):
+            renames[rename["from"]] = rename["to"]
+
+        # list properties are split between the continuations, so they are merged by page
+        for page in query.get("pages", []):
+            merged_page = pages.setdefault(page["title"], {})
+            for key, value in page.items():
+                if isinstance(value, list):
+                    merged_page.setdefault(key, []).extend(value)
+                else:
+                    merged_page[key] = value
+
+    result = {}
+    for title in titles:
+        answered_title = title
+        visited = set()
+        while answered_title in renames and answered_title not in visited:
+            visited.add(answered_title)
+            answered_title = renames[answered_title]
+
+        page = pages.get(answered_title)
+        if page is None or page.get("missing") or page.get("invalid"):
+            result[title] = None
+        else:
+            result[title] = page
+
+    return result
+
+
+def query_langlinks(site: pywikibot.site.APISite, titles: list[str], target_languages: Optional[list[str]] = None,
+                    batch_size: int = 50) -> dict[str, dict[str, str]]:
+    """
+    Retrieve the language links of many pages at once
+    :param site: wiki site object
+    :param titles: titles of the pages
+    :param target_languages: languages to keep, if None every language is kept
+    :param batch_size: maximum number of titles per request
+    :return: dictionary from each title to a dictionary from language to the title in that language
+    """
+
+    params = {"prop": "langlinks", "lllimit": "max"}
+    if target_languages is not None and len(target_languages) == 1:
+        params["lllang"] = target_languages[0]
+
+    langlinks = {}
+    for title, page in query_pages(site, titles, batch_size, **params).items():
+        langlinks[title] = {}
+        if page is None:
+            continue
+
+        for langlink in page.get("langlinks", []):
+            if target_languages is None or langlink["lang"] in target_languages:
+                langlinks[title][langlink["lang"]] = langlink["title"]
+
+    return langlinks
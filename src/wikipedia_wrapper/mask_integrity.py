@@ -0,0 +1,87 @@
+from collections import Counter
+import re
+
+
+MASK_PATTERN = re.compile(r"\[\[(LINK\d+)\||<(REF\d+)>")
+
+
+class MaskIntegrityReport:
+    """
+    Class to report the masks damaged by the translation of a text
+    """
+
+    def __init__(self, missing: list[str], duplicated: list[str], unknown: list[str], out_of_order: int,
+                 max_out_of_order: int):
+        """
+        Mask integrity report constructor
+        :param missing: ids of the masks found fewer times in the translation than in the source
+        :param duplicated: ids of the masks found more times in the translation than in the source
+        :param unknown: ids of the masks found in the translation that are not in the source
+        :param out_of_order: number of consecutive masks in the translation that are inverted regarding the source
+        :param max_out_of_order: maximum number of inversions accepted, languages may reorder some of the masks
+        """
+
+        self.missing = missing
+        self.duplicated = duplicated
+        self.unknown = unknown
+        self.out_of_order = out_of_order
+        self.max_out_of_order = max_out_of_order
+
+    def is_valid(self) -> bool:
+        """
+        Whether the masks of the translation are intact
+        :return: True if no mask is missing, duplicated or unknown and the order is plausible
+        """
+
+        return len(self.missing) == 0 and len(self.duplicated) == 0 and len(self.unknown) == 0 and \
+            self.out_of_order <= self.max_out_of_order
+
+
+def find_masks(text: str) -> list[str]:
+    """
+    Find the ids of the masks of a text, in the order they appear
+    :param text: masked text
+    :return: list of the mask ids, e.g. ["LINK0", "REF0"]
+    """
+
+    return [match.group(1) or match.group(2) for match in MASK_PATTERN.finditer(text)]
+
+
+def check_mask_integrity(source_text: str, translated_text: str) -> MaskIntegrityReport:
+    """
+    Check in a single pass over each text that the translation keeps every mask of the source as many times as in the
+    source and in a plausible order
+    :param source_text: masked text sent to the translation
+    :param translated_text: translated text
+    :return: the integrity report
+    """
+
+    source_masks = find_masks(source_text)
+    translated_masks = find_masks(translated_text)
+
+    source_count = Counter(source_masks)
+    translated_count = Counter(translated_masks)
+    missing = [mask for mask, count in source_count.items() if translated_count[mask] < count]
+    duplicated = [mask for mask, count in source_count.items() if translated_count[mask] > count]
+    unknown = [mask for mask in translated_count if mask not in source_count]
+
+    # count the consecutive masks inverted regarding their first position in the source
+    positions = {}
+    for position, mask in enumerate(source_masks):
+        positions.setdefault(mask, position)
+    known_positions = [positions[mask] for mask in translated_masks if mask in positions]
+    out_of_order = sum(1 for previous, current in zip(known_positions, known_positions[1:]) if current < previous)
+
+    return MaskIntegrityReport(missing, duplicated, unknown, out_of_order, max(1, len(source_masks) // 4))
+
+
+def split_paragraphs(text: str) -> list[str]:
+    """
+    Split a text in paragraphs, each paragraph keeps the blank lines that follow it so joining them gives back the text
+    :param text: text to split
+    :return: list of paragraphs
+    """
+
+    parts = re.split(r"(\n[ \t]*\n\s*)", text)
+    paragraphs = ["".join(parts[i:i + 2]) for i in range(0, len(parts), 2)]
+    return [paragraph for paragraph in paragraphs if paragraph != ""]
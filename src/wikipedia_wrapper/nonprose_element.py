@@ -1,6 +1,28 @@
 from abc import ABC, abstractmethod
+import hashlib
+from typing import Optional, Tuple
 import re
 
+from src.translation_engine.reference_translation import ReferenceTranslator
+
+
+# a reference is either self-closing, <ref name="x" />, or a definition with a body, <ref name="x">...</ref>
+REFERENCE_PATTERN = re.compile(r"<ref(\s[^>]*?)?\s*(?:/>|>(.*?)</ref\s*>)", flags=re.DOTALL | re.IGNORECASE)
+REFERENCE_NAME_PATTERN = re.compile(r"\bname\s*=\s*(?:\"([^\"]*)\"|'([^']*)'|([^\s\"'/>]+))", flags=re.IGNORECASE)
+REFERENCE_GROUP_PATTERN = re.compile(r"\bgroup\s*=\s*(?:\"([^\"]*)\"|'([^']*)'|([^\s\"'/>]+))", flags=re.IGNORECASE)
+
+
+def find_reference_attribute(pattern: re.Pattern, attributes: Optional[str]) -> Optional[str]:
+    """
+    Find the value of an attribute of a reference
+    :param pattern: pattern of the attribute, e.g. REFERENCE_NAME_PATTERN
+    :param attributes: attributes of the ref tag
+    :return: the value of the attribute, None if the reference doesn't have it
+    """
+
+    match = pattern.search(attributes or "")
+    return next(group for group in match.groups() if group is not None) if match else None
+
 
 class NonProseElement(ABC):
     """
@@ -63,15 +85,37 @@ class ReferenceElement(NonProseElement):
     Class to represent the reference's within a wiki text
     """
 
-    def __init__(self, element_id: str, text: str):
+    def __init__(self, element_id: str, text: str, name: Optional[str] = None, group: Optional[str] = None):
         """
         References element constructor
         :param element_id: masked id of the reference
         :param text: the entire xml containing the reference
+        :param name: name of the reference, None for the references cited only once
+        :param group: group of the reference, e.g. note, None for the default group
         """
         super().__init__()
         self.element_id = element_id
         self.text = text
+        self.name = name
+        self.group = group
+
+    def is_definition(self) -> bool:
+        """
+        Whether the reference has a body, and not only the name of a reference defined elsewhere
+        :return: True if the reference has a body
+        """
+
+        return not self.text.rstrip().endswith("/>")
+
+    def get_short_reference(self) -> str:
+        """
+        Short form of the reference, to cite it again after its definition
+        :return: the self-closing reference
+        """
+
+        if self.group is not None:
+            return f"<ref group=\"{self.group}\" name=\"{self.name}\" />"
+        return f"<ref name=\"{self.name}\" />"
 
     def get_element_text(self):
         """
@@ -80,13 +124,17 @@ class ReferenceElement(NonProseElement):
         """
         return self.text
 
-    def translate_element(self, target_language: str):
+    def translate_element(self, target_language: str, reference_translator: Optional[ReferenceTranslator] = None):
         """
-        Translate the Reference to another language
+        Translate the Reference to another language with the local rules of the language pair
         :param target_language: target language
-        :return:
+        :param reference_translator: rule based translator of the language pair, if None the reference is kept
+        :return: the translated reference
         """
-        pass
+
+        if reference_translator is None:
+            return self.text
+        return reference_translator.translate(self.text)
 
 
 class NonProseElements:
@@ -101,6 +149,8 @@ class NonProseElements:
 
         self.hyperlinks: list[HyperLinkElement] = []
         self.references: list[ReferenceElement] = []
+        self.references_by_name: dict[Tuple[Optional[str], str], ReferenceElement] = {}
+        self.references_by_body: dict[Tuple[Optional[str], str], ReferenceElement] = {}
 
     def add_hyperlink(self, link: str) -> str:
         """
@@ -151,34 +201,62 @@ class NonProseElements:
 
         return re.findall(r"\[\[.+?\]\]", text)
 
-    def add_reference(self, reference_text: str) -> str:
+    def add_reference(self, reference_text: str, name: Optional[str] = None,
+                      group: Optional[str] = None) -> ReferenceElement:
         """
         Add a new reference to the list of references
         :param reference_text: the entire xml of a reference
-        :return:
+        :param name: name of the reference
+        :param group: group of the reference
+        :return: the reference element
         """
 
         reference_id = f"REF{len(self.references)}"
-        self.references.append(ReferenceElement(reference_id, reference_text))
+        reference = ReferenceElement(reference_id, reference_text, name, group)
+        self.references.append(reference)
 
-        return reference_id
+        return reference
 
     def pre_process_references(self, text: str) -> str:
         """
-        Preprocess the references within a page
+        Preprocess the references within a page. The references of the same group with the same name or the same body
+        share a single mask, the references cited more than once are named so they can be cited again after their
+        definition.
         text: text to look for the references
         :return: text after preprocessed with the masked references
         """
 
-        # retrieve the links in the text
-        references = self.find_xml_references(text)
+        def mask_reference(match: re.Match) -> str:
+            reference_text = match.group(0)
+            body = match.group(2).strip() if match.group(2) is not None else None
+            name = find_reference_attribute(REFERENCE_NAME_PATTERN, match.group(1))
+            group = find_reference_attribute(REFERENCE_GROUP_PATTERN, match.group(1))
 
-        # build a dictionary and mask the links in the text
-        for ref in references:
-            ref_id = self.add_reference(ref)
-            text = text.replace(ref, f"<{ref_id}>")
+            # the names are unique only within a group of references
+            reference = self.references_by_name.get((group, name)) if name is not None else None
+            if reference is None and body is not None:
+                reference = self.references_by_body.get((group, body))
 
-        return text
+            if reference is None:
+                reference = self.add_reference(reference_text, name, group)
+            elif body is not None and (not reference.is_definition() or reference.name is None and name is not None):
+                # the definition of a named reference may come after its first citation
+                reference.text = reference_text
+                reference.name = name if name is not None else reference.name
+            elif reference.name is None:
+                # the name comes from the body, so it doesn't change between the revisions of the page
+                reference.name = f"autoref{hashlib.sha1(body.encode('utf-8')).hexdigest()[:8]}"
+                reference.text = re.sub(r"^<ref", f"<ref name=\"{reference.name}\"", reference.text, count=1,
+                                        flags=re.IGNORECASE)
+
+            if name is not None:
+                self.references_by_name.setdefault((group, name), reference)
+            if body is not None:
+                self.references_by_body.setdefault((group, body), reference)
+
+            return f"<{reference.element_id}>"
+
+        return REFERENCE_PATTERN.sub(mask_reference, text)
 
     @staticmethod
     def find_xml_references(text):
@@ -188,10 +266,7 @@ class NonProseElements:
         :return: list of the references
         """
 
-        references = re.findall(r"<ref(?: name=\".+?\")?\/?>(?:.+?<\/ref>)?", text)
-        print(references)
-
-        return references
+        return [match.group(0) for match in REFERENCE_PATTERN.finditer(text)]
 
     def post_process_hyperlinks(self, text: str) -> str:
         """
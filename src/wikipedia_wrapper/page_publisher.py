@@ -0,0 +1,219 @@
+import pywikibot
+from pywikibot.page import Page
+
+from contextlib import contextmanager
+from typing import Iterator, Optional
+import logging
+import queue
+import sqlite3
+import threading
+
+from src.wikipedia_wrapper.wikidata_sitelinks import WikidataSitelinks
+
+
+class PagePublisher:
+    """
+    Class to publish the translated pages in a dedicated stage. The pages are received through a queue and saved with
+    the asynchronous put of pywikibot, throttled and maxlag aware, then their Wikidata sitelinks are written. The status
+    of each page is persisted with the source revision it was translated from, so a page is published again only when
+    it comes from a new revision.
+    """
+
+    def __init__(self, wikidata: WikidataSitelinks, edit_interval: Optional[float] = None,
+                 maxlag: Optional[int] = None, status_db: Optional[str] = None):
+        """
+        Constructor of the publisher, starts the publish thread
+        :param wikidata: wikidata layer to write the sitelinks of the published pages
+        :param edit_interval: minimum seconds between two edits, if None the pywikibot configuration is kept
+        :param maxlag: maximum replication lag in seconds before the edits are delayed, if None the pywikibot
+        configuration is kept
+        :param status_db: SQLite file to persist the publish status of the pages, shared by the processes publishing
+        pages, if None the status is kept only in memory
+        """
+
+        if edit_interval is not None:
+            pywikibot.config.put_throttle = edit_interval
+        if maxlag is not None:
+            pywikibot.config.maxlag = maxlag
+
+        self.wikidata = wikidata
+        self.status_db = status_db
+        self.status_lock = threading.Lock()
+        self.memory_connection = sqlite3.connect(":memory:", check_same_thread=False) if status_db is None else None
+        with self.connect() as connection:
+            connection.execute("""CREATE TABLE IF NOT EXISTS publish_status (
+                                    title TEXT NOT NULL,
+                                    language TEXT NOT NULL,
+                                    revision INTEGER,
+                                    status TEXT NOT NULL,
+                                    error TEXT,
+                                    PRIMARY KEY (title, language))""")
+
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.pending_saves = 0
+        self.saves_done = threading.Condition(self.lock)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    @contextmanager
+    def connect(self) -> Iterator[sqlite3.Connection]:
+        """
+        Open a connection to the status database within a transaction, committed if no error happens
+        :return: the connection
+        """
+
+        with self.status_lock:
+            connection = self.memory_connection or sqlite3.connect(self.status_db, timeout=60)
+            try:
+                with connection:
+                    yield connection
+            finally:
+                if connection is not self.memory_connection:
+                    connection.close()
+
+    def set_status(self, title: str, language: str, status: str, error: Optional[str] = None,
+                   revision: Optional[int] = None) -> None:
+        """
+        Update and persist the publish status of a page, a single row is written
+        :param title: title of the page
+        :param language: language of the page
+        :param status: queued, saved, linked or failed
+        :param error: description of the error, for the failed pages
+        :param revision: source revision the page was translated from, if None the recorded revision is kept
+        :return:
+        """
+
+        with self.connect() as connection:
+            connection.execute("INSERT INTO publish_status (title, language, revision, status, error) "
+                               "VALUES (?, ?, ?, ?, ?) ON CONFLICT (title, language) DO UPDATE SET "
+                               "revision = COALESCE(excluded.revision, revision), status = excluded.status, "
+                               "error = excluded.error", (title, language, revision, status, error))
+
+    def is_published(self, title: str, language: str, revision: Optional[int]) -> bool:
+        """
+        Whether a page was already published from a source revision
+        :param title: title of the page
+        :param language: language of the page
+        :param revision: source revision the page was translated from
+        :return: True if the page was saved from the same source revision
+        """
+
+        with self.connect() as connection:
+            row = connection.execute("SELECT revision, status FROM publish_status WHERE title = ? AND language = ?",
+                                     (title, language)).fetchone()
+        return row is not None and revision is not None and row[0] == revision and row[1] in ("saved", "linked")
+
+    def submit(self, page: Page, summary: str, source_page: Page, target_language: str) -> None:
+        """
+        Queue a translated page to be published, the call doesn't wait for the edit
+        :param page: translated page
+        :param summary: summary of the edit
+        :param source_page: page the translation comes from, to set its sitelink
+        :param target_language: language of the translated page
+        :return:
+        """
+
+        revision = source_page.latest_revision_id
+        if self.is_published(page.title(), target_language, revision):
+            logging.info(f"{page.title()} was already published in the {target_language} wikipedia from revision "
+                         f"{revision}")
+            return
+
+        self.set_status(page.title(), target_language, "queued", revision=revision)
+        self.queue.put((page, summary, source_page.title(), source_page.site.code, target_language))
+
+    def run(self) -> None:
+        """
+        Publish thread, saves the queued pages and writes their sitelinks until it receives None
+        :return:
+        """
+
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+
+            page, summary, source_title, source_language, target_language = item
+            with self.lock:
+                self.pending_saves += 1
+            pywikibot.async_request(self.save_page, page, summary,
+                                    self.saved_callback(source_title, source_language, target_language))
+
+            # the sitelinks are written in batches, when no page is waiting in the queue
+            if self.queue.empty():
+                self.flush_sitelinks()
+
+    @staticmethod
+    def save_page(page: Page, summary: str, callback) -> None:
+        """
+        Save a page in the put thread of pywikibot. Every error is given to the callback, as pywikibot gives it only the
+        errors of its own types and any other error would stop the thread without calling it.
+        :param page: translated page
+        :param summary: summary of the edit
+        :param callback: callback called with the page and the error of the save, None if it was saved
+        :return:
+        """
+
+        try:
+            page.save(summary=summary)
+        except Exception as e:
+            callback(page, e)
+        else:
+            callback(page, None)
+
+    def saved_callback(self, source_title: str, source_language: str, target_language: str):
+        """
+        Build the callback of an asynchronous save
+        :param source_title: title of the source page
+        :param source_language: source language
+        :param target_language: language of the saved page
+        :return: the callback, called by save_page with the page and the error of the save
+        """
+
+        def callback(page: Page, error: Optional[Exception]) -> None:
+            try:
+                if error is None:
+                    self.set_status(page.title(), target_language, "saved")
+                    self.wikidata.queue_sitelink(source_title, source_language, page.title(), target_language)
+                else:
+                    logging.error(f"Failed to publish {page.title()}: {error}")
+                    self.set_status(page.title(), target_language, "failed", repr(error))
+            finally:
+                # the save is accounted even if its status can't be written, so close doesn't wait forever
+                with self.lock:
+                    self.pending_saves -= 1
+                    self.saves_done.notify_all()
+
+        return callback
+
+    def flush_sitelinks(self) -> None:
+        """
+        Write the queued sitelinks of the saved pages
+        :return:
+        """
+
+        try:
+            written_sitelinks = self.wikidata.flush()
+        except Exception as e:
+            logging.error(f"Failed to write the sitelinks: {e}")
+            return
+
+        for sitelinks in written_sitelinks.values():
+            for site, title in sitelinks.items():
+                self.set_status(title, site.replace(self.wikidata.site_id(""), ""), "linked")
+
+    def close(self) -> None:
+        """
+        Wait until every queued page is saved and its sitelink written, then stop the publish thread
+        :return:
+        """
+
+        self.queue.put(None)
+        self.thread.join()
+
+        with self.lock:
+            while self.pending_saves > 0:
+                self.saves_done.wait()
+
+        self.flush_sitelinks()
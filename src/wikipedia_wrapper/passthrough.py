@@ -0,0 +1,156 @@
+from typing import Optional, Tuple
+import re
+
+from src.utils.wikitext import find_templates, split_template, normalize_template_name
+from src.wikipedia_wrapper.template_resolver import is_template_name
+
+
+# elements whose whole content is kept as it is
+PASSTHROUGH_TAGS = ("gallery", "math", "syntaxhighlight", "source", "references", "timeline", "graph")
+
+
+class PassthroughClassifier:
+    """
+    Class to find the spans of a masked wiki text that need no translation, e.g. tables of numbers, lists of links,
+    galleries, formulas or reference lists, so they are kept as they are instead of being sent to the translator
+    """
+
+    def __init__(self, templates: Optional[list[str]] = None, min_tokens: int = 30, bytes_per_token: float = 4.0):
+        """
+        Constructor of the classifier
+        :param templates: names of the templates whose parameters are not prose, e.g. coord or reflist
+        :param min_tokens: minimum estimated tokens of a span between two translated spans to be kept out of the
+        translation, the smaller spans are translated with their neighbours to avoid splitting the requests
+        :param bytes_per_token: average number of bytes of a token, to estimate the tokens of a span
+        """
+
+        self.templates = {normalize_template_name(name) for name in (templates or [])}
+        self.min_tokens = min_tokens
+        self.bytes_per_token = bytes_per_token
+
+    def estimate_tokens(self, text: str) -> int:
+        """
+        Estimate the number of tokens of a text from its byte length
+        :param text: text
+        :return: estimated number of tokens
+        """
+
+        return round(len(text.encode("utf-8")) / self.bytes_per_token)
+
+    def strip_markup(self, text: str) -> str:
+        """
+        Remove the markup of a wiki text that is not prose: masks, tags, attributes, urls and the templates without
+        prose. The parameter values of the other templates are kept.
+        :param text: masked wiki text
+        :return: remaining text
+        """
+
+        stripped_text = []
+        position = 0
+        for start, end in find_templates(text):
+            stripped_text.append(text[position:start])
+            position = end
+
+            name, params = split_template(text[start:end])
+            if is_template_name(name) and normalize_template_name(name) not in self.templates:
+                stripped_text.extend(" " + self.strip_markup(param.split("=", 1)[-1]) for param in params)
+        stripped_text.append(text[position:])
+        text = "".join(stripped_text)
+
+        text = re.sub(r"\[\[LINK\d+\|.*?\]\]|<REF\d+>", " ", text)
+        text = re.sub(r"<[^>]*>", " ", text)
+        text = re.sub(r"https?://\S+", " ", text)
+        return re.sub(r"[\w-]+\s*=(?!=)\s*(\"[^\"]*\"|'[^']*'|[^\s|!=]+)", " ", text)
+
+    def has_prose(self, text: str) -> bool:
+        """
+        Whether a masked wiki text has words to translate, abbreviations and words shorter than 3 letters are ignored
+        :param text: masked wiki text
+        :return: True if the text has prose
+        """
+
+        return any(not word.isupper() for word in re.findall(r"[^\W\d_]{3,}", self.strip_markup(text)))
+
+    def find_blocks(self, text: str) -> list[Tuple[str, Optional[bool]]]:
+        """
+        Split a masked wiki text in blocks of whole lines: tags, multi line templates and single lines, the lines of
+        the tables are classified one by one
+        :param text: masked wiki text
+        :return: list of tuple containing the block and whether it passes through, None for the blank lines
+        """
+
+        lines = text.splitlines(keepends=True)
+        template_ends = {start: end for start, end in find_templates(text)}
+
+        blocks = []
+        position = 0
+        i = 0
+        while i < len(lines):
+            line = lines[i]
+            stripped = line.strip()
+            end = i + 1
+
+            tag = re.match(r"<(\w+)", stripped)
+            if stripped == "":
+                blocks.append((line, None))
+            elif tag is not None and tag.group(1).lower() in PASSTHROUGH_TAGS:
+                # the block goes until the line closing the tag
+                closing = re.compile(f"</{tag.group(1)}\\s*>|^<{tag.group(1)}[^>]*/>", flags=re.IGNORECASE)
+                while end < len(lines) and closing.search(lines[end - 1].strip()) is None:
+                    end += 1
+                block = "".join(lines[i:end])
+                remainder = closing.split(lines[end - 1].strip())[-1]
+                blocks.append((block, not self.has_prose(remainder)))
+            elif stripped.startswith("{{") and template_ends.get(position + line.index("{{"), 0) > position + len(line):
+                # multi line template, it passes through only if it has no prose at all
+                template_end = template_ends[position + line.index("{{")]
+                while end < len(lines) and position + len("".join(lines[i:end])) < template_end:
+                    end += 1
+                block = "".join(lines[i:end])
+                blocks.append((block, not self.has_prose(block)))
+            else:
+                blocks.append((line, not self.has_prose(line)))
+
+            position += len("".join(lines[i:end]))
+            i = end
+
+        return blocks
+
+    def split(self, text: str) -> list[Tuple[str, bool]]:
+        """
+        Split a masked wiki text in runs to translate and runs passing through, joining the runs gives back the text
+        :param text: masked wiki text
+        :return: list of tuple containing the run and whether it passes through
+        """
+
+        # the blank lines join the previous block, or the first one at the beginning of the text
+        runs: list[list] = []
+        leading_blank = ""
+        for block, passthrough in self.find_blocks(text):
+            if passthrough is None:
+                if len(runs) > 0:
+                    runs[-1][0] += block
+                else:
+                    leading_blank += block
+            elif len(runs) > 0 and runs[-1][1] == passthrough:
+                runs[-1][0] += block
+            else:
+                runs.append([leading_blank + block, passthrough])
+                leading_blank = ""
+
+        if len(runs) == 0:
+            return [(leading_blank, True)] if leading_blank != "" else []
+
+        # the small spans between two translated spans are translated with them
+        for i in range(1, len(runs) - 1):
+            if runs[i][1] and self.estimate_tokens(runs[i][0]) < self.min_tokens:
+                runs[i][1] = False
+
+        merged_runs = [runs[0]]
+        for run, passthrough in runs[1:]:
+            if merged_runs[-1][1] == passthrough:
+                merged_runs[-1][0] += run
+            else:
+                merged_runs.append([run, passthrough])
+
+        return [(run, passthrough) for run, passthrough in merged_runs]
@@ -0,0 +1,43 @@
+import hashlib
+import re
+
+
+class Section:
+    """
+    Class to represent a section of a wiki text, the lead section has an empty heading
+    """
+
+    def __init__(self, heading: str, text: str):
+        """
+        Section constructor
+        :param heading: title of the section, empty for the lead section
+        :param text: entire text of the section, including its heading line
+        """
+
+        self.heading = heading
+        self.text = text
+
+    def source_hash(self) -> str:
+        """
+        Hash of the section text, used to find the sections changed between two revisions
+        :return: hexadecimal sha256 of the text
+        """
+
+        return hashlib.sha256(self.text.encode("utf-8")).hexdigest()
+
+
+def split_sections(text: str) -> list[Section]:
+    """
+    Split a wiki text in its sections, joining the texts of the sections gives back the original text
+    :param text: wiki text
+    :return: list of sections, starting with the lead section
+    """
+
+    headings = list(re.finditer(r"^(=+)[ \t]*(.+?)[ \t]*\1[ \t]*$", text, flags=re.MULTILINE))
+
+    sections = [Section("", text[:headings[0].start()] if len(headings) > 0 else text)]
+    for i, heading in enumerate(headings):
+        end = headings[i + 1].start() if i + 1 < len(headings) else len(text)
+        sections.append(Section(heading.group(2), text[heading.start():end]))
+
+    return sections
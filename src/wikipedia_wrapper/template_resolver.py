@@ -0,0 +1,227 @@
+import pywikibot
+
+from contextlib import contextmanager
+from typing import Iterator, Optional
+import os
+import sqlite3
+import threading
+
+from src.utils.wikitext import find_templates, split_template, normalize_template_name
+from src.wikipedia_wrapper.batch_queries import query_langlinks, query_pages
+
+
+# magic words written as templates, they exist in every wiki
+MAGIC_WORDS = {"!", "=", "DEFAULTSORT", "DISPLAYTITLE", "PAGENAME", "FULLPAGENAME", "NAMESPACE", "SITENAME",
+               "CURRENTYEAR", "CURRENTMONTH", "CURRENTDAY", "NUMBEROFARTICLES", "LC", "UC", "LCFIRST", "UCFIRST"}
+
+
+def is_template_name(name: str) -> bool:
+    """
+    Whether the name of a {{...}} is a template, and not a parser function, a magic word or a substitution
+    :param name: name of the template
+    :return: True for templates
+    """
+
+    return name != "" and not name.startswith("#") and ":" not in name and name.upper() not in MAGIC_WORDS and \
+        "{" not in name
+
+
+def find_template_names(text: str) -> set[str]:
+    """
+    Find the names of the templates used in a wiki text, including the nested ones
+    :param text: wiki text
+    :return: set of normalized template names
+    """
+
+    names = set()
+    for start, end in find_templates(text):
+        name, _ = split_template(text[start:end])
+        if is_template_name(name):
+            names.add(normalize_template_name(name))
+        names.update(find_template_names(text[start + 2:end - 2]))
+    return names
+
+
+class TemplateResolver:
+    """
+    Class to resolve the templates of a source wiki to their equivalents in a target wiki, through the langlinks of
+    the Template namespace. The resolutions are cached in a SQLite file, as the same templates appear across the
+    articles. The file can be shared by several processes, each resolution is written as its own row.
+    """
+
+    def __init__(self, cache_file: Optional[str] = None, batch_size: int = 50,
+                 replacements: Optional[dict[str, dict[str, str]]] = None):
+        """
+        Constructor of the template resolver
+        :param cache_file: SQLite file to persist the resolutions, if None they are kept only in memory
+        :param batch_size: maximum number of templates per request
+        :param replacements: dictionary from target language to a dictionary from a source template name without
+        equivalent to the text replacing it, the templates without equivalent nor replacement are stripped
+        """
+
+        self.cache_file = cache_file
+        self.batch_size = batch_size
+        self.replacements = {language: {normalize_template_name(name): text for name, text in templates.items()}
+                             for language, templates in (replacements or {}).items()}
+        self.lock = threading.Lock()
+
+        self.cache: dict[str, dict[str, Optional[str]]] = {}
+        if cache_file is not None:
+            directory = os.path.dirname(cache_file)
+            if directory != "":
+                os.makedirs(directory, exist_ok=True)
+            with self.connect() as connection:
+                connection.execute("""CREATE TABLE IF NOT EXISTS template_resolutions (
+                                        language_pair TEXT NOT NULL,
+                                        name TEXT NOT NULL,
+                                        target TEXT,
+                                        PRIMARY KEY (language_pair, name))""")
+
+    @contextmanager
+    def connect(self) -> Iterator[sqlite3.Connection]:
+        """
+        Open a connection to the cache file within a transaction, committed if no error happens
+        :return: the connection
+        """
+
+        connection = sqlite3.connect(self.cache_file, timeout=60)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def resolve(self, names: set[str], source_site: pywikibot.site.APISite,
+                target_site: pywikibot.site.APISite) -> dict[str, Optional[str]]:
+        """
+        Resolve template names to their names in the target wiki, the names not in the cache, nor resolved since by
+        another process, are resolved in batches
+        :param names: normalized template names in the source wiki
+        :param source_site: source wiki site object
+        :param target_site: target wiki site object
+        :return: dictionary from each name to its name in the target wiki, None if it has no equivalent
+        """
+
+        language_pair = f"{source_site.code}-{target_site.code}"
+        with self.lock:
+            cache = self.cache.setdefault(language_pair, {})
+            pending_names = [name for name in names if name not in cache]
+
+        if len(pending_names) > 0:
+            persisted = self.read_persisted(language_pair, pending_names)
+            with self.lock:
+                cache.update(persisted)
+            pending_names = [name for name in pending_names if name not in persisted]
+
+        if len(pending_names) > 0:
+            resolutions = self.query_equivalents(pending_names, source_site, target_site)
+            with self.lock:
+                cache.update(resolutions)
+            self.persist(language_pair, resolutions)
+
+        with self.lock:
+            return {name: cache.get(name) for name in names}
+
+    def query_equivalents(self, names: list[str], source_site: pywikibot.site.APISite,
+                          target_site: pywikibot.site.APISite) -> dict[str, Optional[str]]:
+        """
+        Query the equivalents of templates in the target wiki: first their langlinks, then a template with the same
+        name in the target wiki
+        :param names: normalized template names in the source wiki
+        :param source_site: source wiki site object
+        :param target_site: target wiki site object
+        :return: dictionary from each name to its name in the target wiki, None if it has no equivalent
+        """
+
+        source_namespace = source_site.namespace(10)
+        target_namespace = target_site.namespace(10)
+
+        titles = {f"{source_namespace}:{name}": name for name in names}
+        langlinks = query_langlinks(source_site, list(titles), [target_site.code], self.batch_size)
+
+        resolutions = {}
+        for title, name in titles.items():
+            target_title = langlinks.get(title, {}).get(target_site.code)
+            resolutions[name] = target_title.split(":", 1)[-1] if target_title is not None else None
+
+        # templates without langlinks may still exist with the same name, e.g. imported templates
+        unresolved = {f"{target_namespace}:{name}": name for name, target in resolutions.items() if target is None}
+        for title, page in query_pages(target_site, list(unresolved), self.batch_size, prop="info").items():
+            if page is not None:
+                resolutions[unresolved[title]] = unresolved[title]
+
+        return resolutions
+
+    def read_persisted(self, language_pair: str, names: list[str]) -> dict[str, Optional[str]]:
+        """
+        Read the persisted resolutions of template names
+        :param language_pair: source and target languages, e.g. en-pt
+        :param names: normalized template names in the source wiki
+        :return: dictionary from each persisted name to its name in the target wiki, None if it has no equivalent
+        """
+
+        if self.cache_file is None:
+            return {}
+
+        resolutions = {}
+        with self.connect() as connection:
+            for i in range(0, len(names), self.batch_size):
+                batch = names[i:i + self.batch_size]
+                rows = connection.execute("SELECT name, target FROM template_resolutions WHERE language_pair = ? AND "
+                                          f"name IN ({', '.join('?' * len(batch))})", (language_pair, *batch))
+                resolutions.update(rows.fetchall())
+        return resolutions
+
+    def persist(self, language_pair: str, resolutions: dict[str, Optional[str]]) -> None:
+        """
+        Persist resolutions of template names, one row each, so the resolutions of the other processes are kept
+        :param language_pair: source and target languages, e.g. en-pt
+        :param resolutions: dictionary from each name to its name in the target wiki, None if it has no equivalent
+        :return:
+        """
+
+        if self.cache_file is None:
+            return
+
+        with self.connect() as connection:
+            connection.executemany("INSERT OR REPLACE INTO template_resolutions (language_pair, name, target) "
+                                   "VALUES (?, ?, ?)", [(language_pair, name, target)
+                                                        for name, target in resolutions.items()])
+
+    def apply(self, text: str, resolutions: dict[str, Optional[str]], target_language: str) -> str:
+        """
+        Rename the templates of a text to their names in the target wiki, replacing or stripping the ones without
+        equivalent
+        :param text: wiki text
+        :param resolutions: resolutions of the template names, as returned by resolve
+        :param target_language: target language, to choose the replacements
+        :return: text with the templates of the target wiki
+        """
+
+        replacements = self.replacements.get(target_language, {})
+
+        resolved_text = []
+        position = 0
+        for start, end in find_templates(text):
+            resolved_text.append(text[position:start])
+            position = end
+
+            template = text[start:end]
+            name, _ = split_template(template)
+            normalized_name = normalize_template_name(name)
+            if is_template_name(name) and normalized_name in resolutions:
+                target_name = resolutions[normalized_name]
+                if target_name is None:
+                    resolved_text.append(replacements.get(normalized_name, ""))
+                    continue
+            else:
+                target_name = name
+
+            # rename the template and resolve its nested templates
+            raw_name = template[2:-2].split("|")[0]
+            renamed_name = raw_name.replace(name, target_name) if "{" not in raw_name else raw_name
+            content = template[2 + len(raw_name):-2]
+            resolved_text.append("{{" + renamed_name + self.apply(content, resolutions, target_language) + "}}")
+        resolved_text.append(text[position:])
+
+        return "".join(resolved_text)
@@ -0,0 +1,62 @@
+from typing import Optional
+
+
+class TranslationRecord:
+    """
+    Class to record how a page was translated, so it can later be refreshed from a new revision of the source page
+    """
+
+    def __init__(self, source_title: str, source_language: str, target_title: str, target_language: str,
+                 revision_id: Optional[int], sections: list[dict], links: dict[str, Optional[str]],
+                 statistics: Optional[dict] = None):
+        """
+        Translation record constructor
+        :param source_title: title of the source page
+        :param source_language: source language
+        :param target_title: title of the translated page
+        :param target_language: target language
+        :param revision_id: revision of the source page that was translated
+        :param sections: list of the sections, as dictionaries with the heading, source_hash and translation
+        :param links: dictionary from each linked source title to its title in the target language, None if missing
+        :param statistics: statistics of the translation, e.g. the estimated tokens translated and skipped
+        """
+
+        self.source_title = source_title
+        self.source_language = source_language
+        self.target_title = target_title
+        self.target_language = target_language
+        self.revision_id = revision_id
+        self.sections = sections
+        self.links = links
+        self.statistics = statistics if statistics is not None else {}
+
+    def translations_by_hash(self) -> dict[str, str]:
+        """
+        Translations of the recorded sections by the hash of their source text
+        :return: dictionary from the source hash to the translated section
+        """
+
+        return {section["source_hash"]: section["translation"] for section in self.sections}
+
+    def to_dict(self) -> dict:
+        """
+        Convert the record to a dictionary to be persisted
+        :return: dictionary of the record
+        """
+
+        return {"source_title": self.source_title, "source_language": self.source_language,
+                "target_title": self.target_title, "target_language": self.target_language,
+                "revision_id": self.revision_id, "sections": self.sections, "links": self.links,
+                "statistics": self.statistics}
+
+    @staticmethod
+    def from_dict(record: dict) -> "TranslationRecord":
+        """
+        Build the record from a persisted dictionary
+        :param record: dictionary of the record
+        :return: translation record
+        """
+
+        return TranslationRecord(record["source_title"], record["source_language"], record["target_title"],
+                                 record["target_language"], record["revision_id"], record["sections"],
+                                 record["links"], record.get("statistics"))
@@ -0,0 +1,86 @@
+import pywikibot
+
+from typing import Optional
+import threading
+
+from src.utils.rate_governor import RateGovernor
+
+
+class WikidataSitelinks:
+    """
+    Class to write the Wikidata sitelinks of many pages at once, the writes are queued and applied in a single edit per
+    item
+    """
+
+    def __init__(self, repo: pywikibot.site.DataSite, wikidata_sitelink: str, wikidata_summary: str,
+                 rate_governor: RateGovernor):
+        """
+        Constructor of the Wikidata sitelinks layer
+        :param repo: wikidata site object
+        :param wikidata_sitelink: template of the site id of a language, e.g. "{target_language}wiki"
+        :param wikidata_summary: template of the summary of the sitelink edits
+        :param rate_governor: governor of the rate of the sitelink edits
+        """
+
+        self.repo = repo
+        self.wikidata_sitelink = wikidata_sitelink
+        self.wikidata_summary = wikidata_summary
+        self.rate_governor = rate_governor
+
+        # queued sitelink writes: (source site, source title) -> {target site: target title}
+        self.pending_sitelinks: dict[tuple[str, str], dict[str, str]] = {}
+        self.lock = threading.Lock()
+
+    def site_id(self, language: str) -> str:
+        """
+        Site id of a language in Wikidata
+        :param language: language code
+        :return: the site id, e.g. enwiki
+        """
+
+        return self.wikidata_sitelink.replace("{target_language}", language)
+
+    def queue_sitelink(self, source_title: str, source_language: str, target_title: str, target_language: str) -> None:
+        """
+        Queue a sitelink to be written in the next flush
+        :param source_title: title of the page in the source language
+        :param source_language: source language
+        :param target_title: title of the new page in the target language
+        :param target_language: target language
+        :return:
+        """
+
+        with self.lock:
+            key = (self.site_id(source_language), source_title)
+            self.pending_sitelinks.setdefault(key, {})[self.site_id(target_language)] = target_title
+
+    def flush(self, target_language: Optional[str] = None) -> dict[tuple[str, str], dict[str, str]]:
+        """
+        Write the queued sitelinks, a single edit per item, respecting the rate governor
+        :param target_language: language used in the summary, if None the languages of each edit are listed
+        :return: the sitelinks written, from (source site, source title) to a dictionary from target site to title
+        """
+
+        with self.lock:
+            pending_sitelinks = self.pending_sitelinks
+            self.pending_sitelinks = {}
+
+        items = list(pending_sitelinks.items())
+        for i, ((source_site, source_title), sitelinks) in enumerate(items):
+            languages = target_language
+            if languages is None:
+                languages = ", ".join(site.replace(self.site_id(""), "") for site in sitelinks)
+
+            self.rate_governor.wait()
+            try:
+                data = {"sitelinks": [{"site": site, "title": title} for site, title in sitelinks.items()]}
+                self.repo.editEntity({"site": source_site, "title": source_title}, data,
+                                     summary=self.wikidata_summary.replace("{target_language}", languages))
+            except Exception:
+                # put the sitelinks not written back in the queue before failing
+                with self.lock:
+                    for key, remaining in items[i:]:
+                        self.pending_sitelinks.setdefault(key, {}).update(remaining)
+                raise
+
+        return pending_sitelinks
@@ -2,15 +2,27 @@ import pywikibot
 from pywikibot.page import Page, Link
 
 from src.config.config import Config
-from src.translation_engine.translation import ChatGPTTranslator
+from src.translation_engine.registry import build_translator
+from src.translation_engine.reference_translation import ReferenceTranslator
 
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, Tuple
+import logging
 import re
 
+from src.utils.rate_governor import RateGovernor
 from src.utils.utils import persist_page
+from src.wikipedia_wrapper.batch_queries import query_langlinks, query_pages
+from src.wikipedia_wrapper.mask_integrity import check_mask_integrity, split_paragraphs
 from src.wikipedia_wrapper.nonprose_element import NonProseElements, HyperLinkElement, ReferenceElement
 from src.wikipedia_wrapper.page_doesnt_exist_error import PageDoesntExistError
+from src.wikipedia_wrapper.page_publisher import PagePublisher
+from src.wikipedia_wrapper.passthrough import PassthroughClassifier
+from src.wikipedia_wrapper.sections import Section, split_sections
+from src.wikipedia_wrapper.template_resolver import TemplateResolver, find_template_names
+from src.wikipedia_wrapper.translation_record import TranslationRecord
 from src.wikipedia_wrapper.wiki_not_available_error import WikiNotAvailableError
+from src.wikipedia_wrapper.wikidata_sitelinks import WikidataSitelinks
 
 
 class WikipediaTranslator:
@@ -18,12 +30,13 @@ class WikipediaTranslator:
     Class to wrap the pywikibot
     """
 
-    def __init__(self, config: Config, wiki_languages=None, verbose: bool = True, should_save: bool = True):
+    def __init__(self, config: Config, wiki_languages=None, verbose: bool = True, should_save: bool = False):
         """
         Constructor for the wikipedia wrapper
         :param config: configuration object
         :param wiki_languages: list of wikilanguages
         :param verbose: Verbose or not
+        :param should_save: whether to publish the translated pages to the live wikis
         """
 
         # if no languages are informed, then the default is en, pt
@@ -40,19 +53,51 @@ class WikipediaTranslator:
 
         # predefinitions
         self.non_existing_predefinitions = config.config["non_existing_predefinitions"]
+        self.template_resolver = TemplateResolver(config.config.get("template_cache_file"),
+                                                  config.config.get("query_batch_size", 50),
+                                                  config.config.get("template_replacements"))
 
         # create the wikipedia object and login on it
         self.wiki = dict()
         for language in wiki_languages:
             self.wiki[language] = pywikibot.Site(language, config.config["wikiproject"])
 
-        # translator object
-        self.translator = ChatGPTTranslator(model="gpt-4o-mini", config=config)
+        # wikidata layer to write the sitelinks in batches
+        self.wikidata = WikidataSitelinks(pywikibot.Site("wikidata", "wikidata"), self.wikidata_sitelink,
+                                          self.wikidata_summary,
+                                          RateGovernor(config.config.get("wikidata_edit_interval", 10)))
+
+        # translator object, the backend is selected in the configuration. The requests are bounded for the whole
+        # process, as the pages, the languages and the sections of a page are translated by nested thread pools
+        self.translator = build_translator(config)
+        self.title_batch_size = config.config.get("title_batch_size", 20)
+        self.page_workers = config.config.get("page_workers", 4)
+
+        # classifiers of the spans that need no translation, by source language
+        passthrough = config.config.get("passthrough", {})
+        bytes_per_token = config.config.get("cost_estimator", {}).get("bytes_per_token", 4.0)
+        self.passthrough_classifiers = {
+            language: PassthroughClassifier(passthrough.get("templates", {}).get(language),
+                                            passthrough.get("min_tokens", 30), bytes_per_token)
+            for language in wiki_languages}
+
+        # rule based translators of the references, compiled once for each language pair
+        self.reference_translators = ReferenceTranslator.from_config(config)
+
+        # pages preloaded in batches and their metadata, by (language, title)
+        self.page_cache: dict[Tuple[str, str], Page] = {}
+        self.page_info: dict[Tuple[str, str], dict] = {}
+        self.batch_size = config.config.get("query_batch_size", 50)
 
         # verbose parameter
         self.verbose = verbose
         self.should_save = should_save
 
+        # publish stage of the translated pages
+        self.publisher = None
+        if should_save:
+            self.publisher = PagePublisher(self.wikidata, **config.config.get("publish", {}))
+
     def retrieve_page(self, page_title: str, wiki_language: str = "en") -> pywikibot.Page:
         """
         Retrieve the page
@@ -64,6 +109,11 @@ class WikipediaTranslator:
         if wiki_language not in self.wiki:
             raise WikiNotAvailableError("Wiki language not aviable")
 
+        # the preloaded pages are used only once, as the preprocessing changes their text
+        page = self.page_cache.pop((wiki_language, page_title), None)
+        if page is not None:
+            return page
+
         page = pywikibot.Page(self.wiki[wiki_language], page_title)
         if page.exists():
             return page
@@ -81,44 +131,481 @@ class WikipediaTranslator:
         :return: True or False it was translated correctly.
         """
 
+        translation = self.translate_page_with_record(page_title, source_language, target_language, target_page_title)
+        if translation is None:
+            return None
+        return translation[0]
+
+    def translate_page_with_record(self, page_title: str, source_language: str = "en", target_language: str = "pt",
+                                   target_page_title: Optional[str] = None) -> Optional[Tuple[Page, TranslationRecord]]:
+        """
+        Translate a given page and record how each of its sections was translated
+        :param page_title: name of the page in the source language
+        :param source_language: original language
+        :param target_language: target language
+        :param target_page_title: name of the page to be created in the target language
+        :return: tuple containing the new page and its translation record, None if the page already exists
+        """
+
         # get the wikipedia page
         original_page = self.retrieve_page(page_title, source_language)
-        if self.verbose:
-            self.print_page(original_page)
 
-        # check if translation already exists
-        link = self.get_page_target_language(original_page, target_language)
+        # check if translation already exists, with the langlinks of the prefiltering when the page was prefiltered
+        info = self.page_info.get((source_language, page_title))
+        if info is not None:
+            translated = any(langlink["lang"] == target_language for langlink in info.get("langlinks", []))
+        else:
+            translated = self.get_page_target_language(original_page, target_language) is not None
 
         # if page in the target language doesn't exist yet.
-        if link is None:
+        if not translated:
+            if self.verbose:
+                self.print_page(original_page)
 
-            # preprocess the page to deal with hyperlinks
+            # preprocess the page to deal with hyperlinks, the source sections are kept to record the translation
+            source_sections = split_sections(original_page.text)
             original_page, non_prose_elements = self.pre_process_text(original_page)
 
-            # translate text and title
-            translated_text = self.translator.perform_translation(original_page.text, source_language, target_language,
-                                                                  translation_type="text")
+            return self.translate_masked_page(original_page, non_prose_elements, source_language, target_language,
+                                              target_page_title, source_sections=source_sections)
+        return None
+
+    def prefilter_work_list(self, work_list: list[Tuple]) -> list[Tuple]:
+        """
+        Drop the pages of a work list that don't exist in the source wiki or are already translated, with batched
+        info and langlinks requests that don't download the content of the pages
+        :param work_list: list of tuple containing: (source page, source language, target page, target language)
+        :return: the work list without the skipped pages
+        """
+
+        # query the source pages grouped by source language
+        titles = {}
+        for source_page, source_language, _, target_language in work_list:
+            if source_language not in self.wiki or target_language not in self.wiki:
+                logging.info(f"Skipping {source_page}, {source_language} or {target_language} is not available")
+                continue
+            titles.setdefault(source_language, []).append(source_page)
+
+        pages = {}
+        for source_language, source_titles in titles.items():
+            for title, page in query_pages(self.wiki[source_language], source_titles, self.batch_size,
+                                           prop="info|langlinks", lllimit="max").items():
+                pages[(source_language, title)] = page
+                if page is not None:
+                    self.page_info[(source_language, title)] = page
+
+        filtered_work_list = []
+        for source_page, source_language, target_page, target_language in work_list:
+            if (source_language, source_page) not in pages:
+                continue
+
+            page = pages[(source_language, source_page)]
+            if page is None:
+                logging.info(f"Skipping {source_page}, it doesn't exist in the {source_language} wikipedia")
+            elif any(langlink["lang"] == target_language for langlink in page.get("langlinks", [])):
+                logging.info(f"Skipping {source_page}, it is already translated to {target_language}")
+            else:
+                filtered_work_list.append((source_page, source_language, target_page, target_language))
+
+        return filtered_work_list
+
+    def filter_target_collisions(self, work_list: list[Tuple]) -> list[Tuple]:
+        """
+        Drop the pages of a work list whose target title already exists in the target wiki, with batched requests
+        :param work_list: list of tuple containing: (source page, source language, target page, target language)
+        :return: the work list without the colliding pages
+        """
+
+        titles = {}
+        for _, _, target_page, target_language in work_list:
+            if target_page is not None:
+                titles.setdefault(target_language, []).append(target_page)
+
+        existing_pages = set()
+        for target_language, target_titles in titles.items():
+            for title, page in query_pages(self.wiki[target_language], target_titles, self.batch_size,
+                                           prop="info").items():
+                if page is not None:
+                    existing_pages.add((target_language, title))
+
+        filtered_work_list = []
+        for source_page, source_language, target_page, target_language in work_list:
+            if (target_language, target_page) in existing_pages:
+                logging.info(f"Skipping {source_page}, {target_page} already exists in the {target_language} wikipedia")
+            else:
+                filtered_work_list.append((source_page, source_language, target_page, target_language))
+
+        return filtered_work_list
+
+    def prepare_work_list(self, work_list: list[Tuple]) -> list[Tuple]:
+        """
+        Prepare a work list before the translation: drop the pages that don't exist or are already translated,
+        translate the missing target titles in batches grouped by language pair, then drop the pages whose target
+        title is already taken
+        :param work_list: list of tuple containing: (source page, source language, target page, target language),
+        the target page may be None
+        :return: the work list with every target title filled
+        """
+
+        work_list = self.prefilter_work_list(work_list)
+
+        missing_titles = {}
+        for source_page, source_language, target_page, target_language in work_list:
+            if target_page is None:
+                missing_titles.setdefault((source_language, target_language), []).append(source_page)
+
+        translated_titles = {}
+        for (source_language, target_language), titles in missing_titles.items():
+            translated_titles[(source_language, target_language)] = self.translate_titles(titles, source_language,
+                                                                                          target_language)
+
+        work_list = [(source_page, source_language,
+                      target_page or translated_titles[(source_language, target_language)][source_page],
+                      target_language)
+                     for source_page, source_language, target_page, target_language in work_list]
+
+        return self.filter_target_collisions(work_list)
+
+    def preload_pages(self, work_list: list[Tuple]) -> None:
+        """
+        Preload the content and the langlinks of the source pages of a work list in batches, they are used by
+        retrieve_page
+        :param work_list: list of tuple containing: (source page, source language, target page, target language)
+        :return:
+        """
+
+        titles = {}
+        for source_page, source_language, _, _ in work_list:
+            titles.setdefault(source_language, []).append(source_page)
+
+        for source_language, source_titles in titles.items():
+            pages = [pywikibot.Page(self.wiki[source_language], title) for title in dict.fromkeys(source_titles)]
+            requested_titles = {page.title(): title for page, title in zip(pages, dict.fromkeys(source_titles))}
+            for page in self.wiki[source_language].preloadpages(pages, groupsize=self.batch_size, langlinks=True):
+                title = requested_titles.get(page.title(), page.title())
+                self.page_cache[(source_language, title)] = page
+
+    def get_pages_metadata(self, work_list: list[Tuple]) -> dict[Tuple, dict]:
+        """
+        Metadata of the source pages of a work list, from the prefiltering and the preloading, without new requests
+        :param work_list: list of tuple containing: (source page, source language, target page, target language)
+        :return: dictionary from each work item to the length in bytes, links and references counts of its page
+        """
+
+        metadata = {}
+        for item in work_list:
+            source_page, source_language = item[0], item[1]
+            info = self.page_info.get((source_language, source_page), {})
+            page = self.page_cache.get((source_language, source_page))
+            text = page.text if page is not None else ""
+
+            metadata[item] = {"length": info.get("length", len(text.encode("utf-8"))),
+                              "links": text.count("[["), "references": text.count("<ref")}
+        return metadata
+
+    def translate_page_multi(self, page_title: str, source_language: str = "en",
+                             target_languages: Optional[list[str]] = None,
+                             target_page_titles: Optional[dict[str, str]] = None) \
+            -> dict[str, Optional[Tuple[Page, TranslationRecord]]]:
+        """
+        Translate a given page to many languages, fetching and masking the source page once and resolving the links
+        for all the target languages at once. The translations to each language run concurrently.
+        :param page_title: name of the page in the source language
+        :param source_language: original language
+        :param target_languages: target languages, default are all the wiki languages but the source
+        :param target_page_titles: dictionary from target language to the name of the page to be created
+        :return: dictionary from target language to the new page and its translation record, None for languages where
+        the page already exists
+        """
+
+        if target_languages is None:
+            target_languages = [language for language in self.wiki if language != source_language]
+        if target_page_titles is None:
+            target_page_titles = {}
+
+        # get the wikipedia page
+        original_page = self.retrieve_page(page_title, source_language)
+
+        # check which translations already exist, a single langlinks request for every language
+        links = self.get_page_target_languages(original_page, target_languages)
+        pending_languages = [language for language in target_languages if language not in links]
+        new_pages = {language: None for language in target_languages}
+        if len(pending_languages) == 0:
+            return new_pages
+        if self.verbose:
+            self.print_page(original_page)
+
+        # preprocess the page and resolve its links once for all the pending languages
+        source_sections = split_sections(original_page.text)
+        original_page, non_prose_elements = self.pre_process_text(original_page)
+        resolved_links = self.resolve_hyperlinks(non_prose_elements.hyperlinks, source_language, pending_languages)
+
+        with ThreadPoolExecutor(max_workers=len(pending_languages)) as executor:
+            futures = {language: executor.submit(self.translate_masked_page, original_page, non_prose_elements,
+                                                 source_language, language, target_page_titles.get(language),
+                                                 resolved_links, source_sections)
+                       for language in pending_languages}
+            for language, future in futures.items():
+                new_pages[language] = future.result()
+
+        return new_pages
+
+    def refresh_page(self, record: TranslationRecord) -> Optional[Tuple[Page, TranslationRecord]]:
+        """
+        Refresh a translated page from the latest revision of its source page. Only the sections changed since the
+        recorded revision are translated again and only the links not resolved before are resolved.
+        :param record: translation record of the page
+        :return: tuple containing the refreshed page and its new record, None if the source page didn't change
+        """
+
+        original_page = self.retrieve_page(record.source_title, record.source_language)
+        if original_page.latest_revision_id == record.revision_id:
+            return None
+
+        source_sections = split_sections(original_page.text)
+        original_page, non_prose_elements = self.pre_process_text(original_page)
+
+        return self.translate_masked_page(original_page, non_prose_elements, record.source_language,
+                                          record.target_language, record.target_title,
+                                          source_sections=source_sections, record=record)
+
+    def translate_masked_page(self, original_page: Page, non_prose_elements: NonProseElements,
+                              source_language: str, target_language: str, target_page_title: Optional[str] = None,
+                              resolved_links: Optional[dict[str, dict[str, str]]] = None,
+                              source_sections: Optional[list[Section]] = None,
+                              record: Optional[TranslationRecord] = None) -> Tuple[Page, TranslationRecord]:
+        """
+        Translate a page already preprocessed section by section and build the page in the target language
+        :param original_page: page with the non-prose elements masked
+        :param non_prose_elements: non-prose elements of the page, built in the preprocess function
+        :param source_language: original language
+        :param target_language: target language
+        :param target_page_title: name of the page to be created in the target language
+        :param resolved_links: links already resolved by resolve_hyperlinks, if None they are resolved here
+        :param source_sections: sections of the page before the preprocessing, used to record the translation
+        :param record: previous translation record, its sections and links are reused when their source didn't change
+        :return: tuple containing the new page in the target language and its translation record
+        """
+
+        masked_sections = split_sections(original_page.text)
+        if source_sections is None:
+            source_sections = masked_sections
+        previous_translations = record.translations_by_hash() if record is not None else {}
+        known_links = record.links if record is not None else {}
+
+        # only the sections whose source changed are translated
+        pending_sections = [i for i, section in enumerate(source_sections)
+                            if section.source_hash() not in previous_translations
+                            and masked_sections[i].text.strip() != ""]
+
+        # the title, the pending sections, the links and the templates don't depend on each other until the post
+        # process, so they are translated and resolved concurrently
+        with ThreadPoolExecutor(max_workers=self.page_workers) as executor:
+            title_future = None
             if target_page_title is None:
-                target_page_title = self.translator.perform_translation(original_page.title(), source_language, target_language,
-                                                                        translation_type="title")
+                title_future = executor.submit(self.translator.perform_translation, original_page.title(),
+                                               source_language, target_language, translation_type="title")
+            links_future = None
+            if resolved_links is None:
+                links_future = executor.submit(self.resolve_section_links, non_prose_elements,
+                                               [masked_sections[i] for i in pending_sections], known_links,
+                                               source_language, target_language)
+
+            # resolve the templates of the pending sections at once, the post process of each section reads the cache
+            templates_future = executor.submit(self.resolve_templates,
+                                               "".join(masked_sections[i].text for i in pending_sections),
+                                               source_language, target_language)
+            section_futures = {i: executor.submit(self.translate_section, masked_sections[i].text, source_language,
+                                                  target_language)
+                               for i in pending_sections}
+
+            if title_future is not None:
+                target_page_title = title_future.result()
+            if links_future is not None:
+                resolved_links = links_future.result()
+            templates_future.result()
+            translated_pending_sections = {i: future.result() for i, future in section_futures.items()}
+
+        # create a new page and post process the pending sections
+        new_page = Page(source=self.wiki[target_language], title=target_page_title)
+        translated_sections = []
+        statistics = {"tokens": 0, "skipped_tokens": 0}
+        defined_references = set()
+        for i, source_section in enumerate(source_sections):
+            if i in pending_sections:
+                new_page.text, tokens, skipped_tokens = translated_pending_sections[i]
+                statistics["tokens"] += tokens
+                statistics["skipped_tokens"] += skipped_tokens
+                new_page = self.post_process(new_page, non_prose_elements, source_language, target_language,
+                                             resolved_links, defined_references)
+                translated_sections.append(new_page.text)
+            else:
+                translation = previous_translations.get(source_section.source_hash(), source_section.text)
+                defined_references.update(self.find_reused_references(translation, masked_sections[i].text,
+                                                                      non_prose_elements.references, source_language,
+                                                                      target_language))
+                translated_sections.append(translation)
+
+        new_page.text = "".join(translated_sections)
+        logging.info(f"{original_page.title()}: {statistics['skipped_tokens']} of {statistics['tokens']} estimated "
+                     f"tokens passed through without translation")
+        if self.verbose:
+            self.print_page(new_page)
+
+        # record the translation of each section and the resolution of the links
+        links = dict(known_links)
+        for hyperlink in non_prose_elements.hyperlinks:
+            if hyperlink.element_id in resolved_links or hyperlink.text not in links:
+                links[hyperlink.text] = resolved_links.get(hyperlink.element_id, {}).get(target_language)
+        new_record = TranslationRecord(original_page.title(), source_language, target_page_title, target_language,
+                                       original_page.latest_revision_id,
+                                       [{"heading": section.heading, "source_hash": section.source_hash(),
+                                         "translation": translation}
+                                        for section, translation in zip(source_sections, translated_sections)],
+                                       links, statistics)
+
+        # queue the page to be saved and its language link to be updated in wikidata, without waiting for the edit
+        if self.publisher is not None:
+            self.publisher.submit(new_page, self.generate_summary(original_page.title(), source_language),
+                                  original_page, target_language)
+        return new_page, new_record
+
+    def resolve_section_links(self, non_prose_elements: NonProseElements, sections: list[Section],
+                              known_links: dict[str, Optional[str]], source_language: str,
+                              target_language: str) -> dict[str, dict[str, str]]:
+        """
+        Resolve the links of some masked sections, only the links that were not resolved before are requested
+        :param non_prose_elements: non-prose elements of the page, built in the preprocess function
+        :param sections: masked sections
+        :param known_links: links resolved before, from the linked source title to its title in the target language
+        :param source_language: original language
+        :param target_language: target language
+        :return: dictionary from the link id to a dictionary from target language to the linked title in that language
+        """
 
-            # create a new page and set the text
-            new_page = Page(source=self.wiki[target_language], title=target_page_title)
-            new_page.text = translated_text
-            if self.verbose:
-                self.print_page(new_page)
+        link_ids = set()
+        for section in sections:
+            link_ids.update(re.findall(r"\[\[(LINK\d+)\|", section.text))
+        hyperlinks = [hyperlink for hyperlink in non_prose_elements.hyperlinks
+                      if hyperlink.element_id in link_ids and hyperlink.text not in known_links]
+        resolved_links = self.resolve_hyperlinks(hyperlinks, source_language, [target_language])
+        for hyperlink in non_prose_elements.hyperlinks:
+            if hyperlink.text in known_links and known_links[hyperlink.text] is not None:
+                resolved_links[hyperlink.element_id] = {target_language: known_links[hyperlink.text]}
 
-            # post process the links to deal with them
-            new_page = self.post_process(new_page, non_prose_elements, source_language, target_language)
-            if self.verbose:
-                self.print_page(new_page)
+        return resolved_links
 
-            # save the page and update the language link in wikidata
-            # if self.should_save:
-            #     new_page.save(self.generate_summary(page_title, source_language))
-            #     self.set_language_link(original_page, new_page, target_language)
-            return new_page
-        return None
+    def translate_section(self, text: str, source_language: str, target_language: str) -> Tuple[str, int, int]:
+        """
+        Translate a masked section, the spans without prose pass through and are spliced back in place. The labels of
+        the links of these spans are translated together in a single batch.
+        :param text: masked text of the section
+        :param source_language: original language
+        :param target_language: target language
+        :return: tuple containing the translated text, the estimated tokens of the section and the ones skipped
+        """
+
+        classifier = self.passthrough_classifiers.get(source_language) or PassthroughClassifier()
+        runs = classifier.split(text)
+
+        # labels of the links passing through, e.g. in the lists of links or in the tables
+        labels = {label for run, passthrough in runs if passthrough
+                  for label in re.findall(r"\[\[LINK\d+\|(.*?)\]\]", run) if classifier.has_prose(label)}
+        translated_labels = self.translate_titles(sorted(labels), source_language, target_language) \
+            if len(labels) > 0 else {}
+
+        def translate_label(match: re.Match) -> str:
+            return f"[[{match.group(1)}|{translated_labels.get(match.group(2), match.group(2))}]]"
+
+        translated_runs = []
+        skipped_tokens = 0
+        for run, passthrough in runs:
+            if passthrough:
+                translated_runs.append(re.sub(r"\[\[(LINK\d+)\|(.*?)\]\]", translate_label, run))
+                skipped_tokens += classifier.estimate_tokens(run)
+            else:
+                # the blank lines around the run are kept, the translator may drop them
+                stripped_run = run.strip()
+                translation = self.translate_segment(stripped_run, source_language, target_language).strip()
+                translated_runs.append(run[:len(run) - len(run.lstrip())] + translation + run[len(run.rstrip()):])
+
+        return "".join(translated_runs), classifier.estimate_tokens(text), skipped_tokens
+
+    def translate_segment(self, text: str, source_language: str, target_language: str) -> str:
+        """
+        Translate a masked segment of text and check the integrity of its masks. The paragraphs with damaged masks are
+        requested again with a stricter prompt, the whole segment only if its paragraphs can't be matched.
+        :param text: masked text
+        :param source_language: original language
+        :param target_language: target language
+        :return: translated text
+        """
+
+        translation = self.translator.perform_translation(text, source_language, target_language,
+                                                          translation_type="text")
+        if check_mask_integrity(text, translation).is_valid():
+            return translation
+
+        source_paragraphs = split_paragraphs(text)
+        translated_paragraphs = split_paragraphs(translation)
+        if len(source_paragraphs) == len(translated_paragraphs):
+            for i, (source_paragraph, translated_paragraph) in enumerate(zip(source_paragraphs, translated_paragraphs)):
+                if not check_mask_integrity(source_paragraph, translated_paragraph).is_valid():
+                    translated_paragraphs[i] = self.repair_segment(source_paragraph, source_language, target_language)
+            translation = "".join(translated_paragraphs)
+        else:
+            translation = self.repair_segment(text, source_language, target_language)
+
+        report = check_mask_integrity(text, translation)
+        if not report.is_valid():
+            logging.warning(f"Masks still damaged after the retry, missing: {report.missing}, duplicated: "
+                            f"{report.duplicated}, unknown: {report.unknown}, out of order: {report.out_of_order}")
+        return translation
+
+    def repair_segment(self, text: str, source_language: str, target_language: str) -> str:
+        """
+        Translate again a segment whose masks were damaged, with the stricter prompt
+        :param text: masked segment
+        :param source_language: original language
+        :param target_language: target language
+        :return: translated segment, keeping the trailing blank lines of the source segment
+        """
+
+        stripped_text = text.rstrip()
+        translation = self.translator.perform_translation(stripped_text, source_language, target_language,
+                                                          translation_type="text_strict")
+        return translation.rstrip() + text[len(stripped_text):]
+
+    def translate_titles(self, titles: list[str], source_language: str = "en",
+                         target_language: str = "pt") -> dict[str, str]:
+        """
+        Translate page titles in batches of title_batch_size titles per request. Titles whose answer fails the
+        validation are translated again with a single request each.
+        :param titles: titles of the pages in the source language
+        :param source_language: original language
+        :param target_language: target language
+        :return: dictionary from the source title to the translated title
+        """
+
+        pending = list(dict.fromkeys(titles))
+        translated_titles = {}
+
+        # translate the titles in batches with a structured output
+        for i in range(0, len(pending), self.title_batch_size):
+            batch = pending[i:i + self.title_batch_size]
+            translations = self.translator.perform_batch_translation(batch, source_language, target_language,
+                                                                     translation_type="title")
+            for title, translation in zip(batch, translations):
+                if translation is not None:
+                    translated_titles[title] = translation
+
+        # fall back to a single request for the titles that failed the validation
+        for title in pending:
+            if title not in translated_titles:
+                translated_titles[title] = self.translator.perform_translation(title, source_language, target_language,
+                                                                               translation_type="title")
+
+        return translated_titles
 
     def pre_process_text(self, page: Page) -> Tuple[Page, NonProseElements]:
         """
@@ -173,37 +660,44 @@ class WikipediaTranslator:
         return re.findall("\[\[.+?\]\]", text)
 
     def post_process(self, page: Page, non_prose_elements: NonProseElements, source_language: str = "en",
-                     target_language: str = "pt") -> Page:
+                     target_language: str = "pt", resolved_links: Optional[dict[str, dict[str, str]]] = None,
+                     defined_references: Optional[set[str]] = None) -> Page:
         """
         Post process the wiki page after the translation is done
         :param page:
         :param non_prose_elements: dictionary of the links, built in the preprocess function
         :param source_language: source language
         :param target_language: target language
+        :param resolved_links: links already resolved by resolve_hyperlinks, if None they are resolved one by one
+        :param defined_references: ids of the references already defined in the previous parts of the page
         :return: page
         """
 
         # process the hyperlinks first
         text = page.text
 
-        page = self.post_process_hyperlinks(page, non_prose_elements.hyperlinks, source_language, target_language)
+        page = self.post_process_hyperlinks(page, non_prose_elements.hyperlinks, source_language, target_language,
+                                            resolved_links)
 
         # post process the templates
-        page = self.post_process_predefinitions(page, target_language)
+        page = self.post_process_predefinitions(page, target_language, source_language)
 
         # post process the references
-        page = self.post_process_references(page, non_prose_elements.references)
+        page = self.post_process_references(page, non_prose_elements.references, source_language, target_language,
+                                            defined_references)
 
         return page
 
     def post_process_hyperlinks(self, page: Page, hyperlinks: list[HyperLinkElement], source_language: str,
-                                target_language: str) -> Page:
+                                target_language: str,
+                                resolved_links: Optional[dict[str, dict[str, str]]] = None) -> Page:
         """
         Post process the hyperlinks
         :param page: page object
         :param hyperlinks_dict: dictionary with hyperlinks
         :param source_language: source language
         :param target_language: target language
+        :param resolved_links: links already resolved by resolve_hyperlinks, if None they are resolved one by one
         :return: new page after solving the hyperlinks
         """
 
@@ -216,57 +710,143 @@ class WikipediaTranslator:
             page_name = hyperlink.text
 
             # retrieve the linked page in the hyperlink, get its equivalent in the target language. If it doesn't exist
-            try:
-                linked_page = self.retrieve_page(page_name, source_language)
-                target_page = self.get_page_target_language(linked_page, target_language)
-            except WikiNotAvailableError:
-                target_page = None
-            except PageDoesntExistError:
-                target_page = None
+            if resolved_links is not None:
+                target_link = resolved_links.get(code, {}).get(target_language)
+            else:
+                try:
+                    linked_page = self.retrieve_page(page_name, source_language)
+                    target_page = self.get_page_target_language(linked_page, target_language)
+                except WikiNotAvailableError:
+                    target_page = None
+                except PageDoesntExistError:
+                    target_page = None
+
+                target_link = None
+                if target_page is not None:
+                    target_link = str(target_page).replace(f"{target_language}:", "").replace("[[", "").\
+                        replace("]]", "")
 
             # replace the target links with the correct code
-            if target_page is not None:
-                target_link = str(target_page).replace(f"{target_language}:", "").replace("[[", "").replace("]]", "")
+            if target_link is not None:
                 text = text.replace(code + "|", target_link + "|")
             else:
-                text = re.sub(f"\[\[{code}\|(.+?)\]\]", r"\1", text)
+                text = re.sub(f"\\[\\[{code}\\|(.+?)\\]\\]", r"\1", text)
         page.text = text
 
         return page
 
-    def post_process_predefinitions(self, page: Page, language: str) -> Page:
+    def resolve_hyperlinks(self, hyperlinks: list[HyperLinkElement], source_language: str,
+                           target_languages: list[str]) -> dict[str, dict[str, str]]:
         """
-        Post process the nonexisting predefinition and incorrect translations
+        Resolve the hyperlinks to their pages in the target languages, with batched langlinks requests
+        :param hyperlinks: hyperlinks built in the preprocess function
+        :param source_language: source language
+        :param target_languages: target languages
+        :return: dictionary from the link id to a dictionary from target language to the linked title in that language
+        """
+
+        if source_language not in self.wiki:
+            return {}
+
+        # the section of a link is not part of the page title
+        titles = {hyperlink.element_id: hyperlink.text.split("#")[0].strip() for hyperlink in hyperlinks}
+        langlinks = query_langlinks(self.wiki[source_language], [title for title in titles.values() if title != ""],
+                                    target_languages)
+
+        return {element_id: langlinks.get(title, {}) for element_id, title in titles.items()}
+
+    def resolve_templates(self, text: str, source_language: str, target_language: str) -> dict[str, Optional[str]]:
+        """
+        Resolve the templates of a text to their names in the target wiki, with batched langlinks requests
+        :param text: wiki text in the source language
+        :param source_language: source language
+        :param target_language: target language
+        :return: dictionary from each template name to its name in the target wiki, None if it has no equivalent
+        """
+
+        if source_language not in self.wiki or target_language not in self.wiki:
+            return {}
+
+        return self.template_resolver.resolve(find_template_names(text), self.wiki[source_language],
+                                              self.wiki[target_language])
+
+    def post_process_predefinitions(self, page: Page, language: str, source_language: str = "en") -> Page:
+        """
+        Post process the nonexisting predefinition and incorrect translations. The templates are renamed to their
+        equivalents in the target wiki, the ones without equivalent are replaced or stripped.
         :param page: pywikibot page object
         :param language: target language
+        :param source_language: source language
         :return: pywikibot page object with fixed predefinitons
         """
 
         text = page.text
-        for predefinition in self.non_existing_predefinitions[language]:
+        resolutions = self.resolve_templates(text, source_language, language)
+        text = self.template_resolver.apply(text, resolutions, language)
+        for predefinition in self.non_existing_predefinitions.get(language, []):
             text = text.replace(predefinition, "")
         page.text = text
         return page
 
-    def post_process_references(self, page: Page, references: list[ReferenceElement]):
+    def post_process_references(self, page: Page, references: list[ReferenceElement], source_language: str = "en",
+                                target_language: str = "pt", defined_references: Optional[set[str]] = None):
         """
-        Post Process the references
+        Post Process the references, translating their citation templates with the local rules of the language pair
         :param page:
         :param references:
+        :param source_language: source language
+        :param target_language: target language
+        :param defined_references: ids of the references already defined in the previous parts of the page, updated
+        with the ones defined in this text
         :return:
         """
 
-        text = page.text
-        for reference in references:
-            ref_id = reference.element_id
-            reference_text = reference.text
-
-            text = text.replace(f"<{ref_id}>", reference_text)
-        page.text = text
+        reference_translator = self.reference_translators.get((source_language, target_language))
+        references_by_id = {reference.element_id: reference for reference in references}
+        if defined_references is None:
+            defined_references = set()
+
+        # the first citation of a reference gets its definition, the next ones its short form
+        def unmask_reference(match: re.Match) -> str:
+            reference = references_by_id.get(match.group(1))
+            if reference is None:
+                return match.group(0)
+            if reference.name is not None and reference.element_id in defined_references:
+                return reference.get_short_reference()
+            if reference.is_definition():
+                defined_references.add(reference.element_id)
+            return reference.translate_element(target_language, reference_translator)
+
+        page.text = re.sub(r"<(REF\d+)>", unmask_reference, page.text)
         return page
 
 
 
+    def find_reused_references(self, translation: str, masked_text: str, references: list[ReferenceElement],
+                               source_language: str, target_language: str) -> set[str]:
+        """
+        Find the references defined by a reused section. A reference of the masked section counts as defined only if
+        the reused translation holds its current definition, it doesn't when e.g. the reference got a name since the
+        recorded revision, so the next citation gets the definition again instead of a short form of an unknown name.
+        :param translation: recorded translation of the section
+        :param masked_text: masked text of the section in the current revision
+        :param references: references of the page
+        :param source_language: source language
+        :param target_language: target language
+        :return: ids of the references defined by the section
+        """
+
+        reference_translator = self.reference_translators.get((source_language, target_language))
+        references_by_id = {reference.element_id: reference for reference in references}
+
+        defined_references = set()
+        for reference_id in re.findall(r"<(REF\d+)>", masked_text):
+            reference = references_by_id.get(reference_id)
+            if reference is not None and reference.is_definition() and \
+                    reference.translate_element(target_language, reference_translator) in translation:
+                defined_references.add(reference_id)
+        return defined_references
+
     def get_page_target_language(self, page: Page, target_language: str = "pt") -> Optional[Link]:
         """
         Get the page in the target language
@@ -281,6 +861,23 @@ class WikipediaTranslator:
                 return link
         return None
 
+    def get_page_target_languages(self, page: Page, target_languages: list[str]) -> dict[str, Link]:
+        """
+        Get the page in many target languages, iterating the langlinks of the page once
+        :param page: source page
+        :param target_languages: target languages to check
+        :return: dictionary from target language to the page in that language, for the existing ones only
+        """
+
+        linksites = {self.wikipedia_linksite.replace("{target_language}", language): language
+                     for language in target_languages}
+
+        links = {}
+        for link in page.langlinks():
+            if str(link.site) in linksites:
+                links[linksites[str(link.site)]] = link
+        return links
+
     def generate_summary(self, page_title: str, source_language: str) -> str:
         """
         Generate Summary to Publish/save the page in the wiki project
@@ -298,18 +895,24 @@ class WikipediaTranslator:
 
     def set_language_link(self, page: Page, new_page: Page, target_language: str):
         """
-        Update the language link
+        Queue the language link, the queued links are written together when the translator is closed
         :param page: original Page object
         :param new_page: newly created page translated from the original page
         :param target_language: target language
         :return:
         """
 
-        item = pywikibot.ItemPage.fromPage(page)
-        item.get()
-        item.setSitelink(sitelink={'site': self.wikidata_sitelink.replace("{target_language}", target_language),
-                                   'title': new_page.title()},
-                         summary=self.wikidata_summary.replace("{target_language}", target_language))
+        self.wikidata.queue_sitelink(page.title(), page.site.code, new_page.title(), target_language)
+
+    def close(self) -> None:
+        """
+        Wait until the queued pages are published and write the queued language links
+        :return:
+        """
+
+        if self.publisher is not None:
+            self.publisher.close()
+        self.wikidata.flush()
 
     def print_page(self, page: Page) -> None:
         """
@@ -323,15 +926,19 @@ class WikipediaTranslator:
         print(page_str)
 
     @staticmethod
-    def persist_page(page: Page, destination_path: str):
+    def persist_page(page: Page, destination_path: str, record: Optional[TranslationRecord] = None):
         """
         Persist page to a local file
         :param page: page object
         :param destination_path: where to save the page
+        :param record: translation record of the page, persisted alongside the page to allow refreshing it later
         :return:
         """
 
-        persist_page({"title": page.title(), "text": page.text}, destination_path)
+        page_content = {"title": page.title(), "text": page.text}
+        if record is not None:
+            page_content["record"] = record.to_dict()
+        persist_page(page_content, destination_path)
 
 
 
@@ -0,0 +1,78 @@
+import pytest
+
+from src.translation_engine.local_translation import CTranslate2Translator
+from src.wikipedia_wrapper.mask_integrity import check_mask_integrity
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "'''Suellia''' lived in [[LINK0|imperial times]].<REF0> Her family was at [[LINK1|Ligures]].<REF1>\n"
+        "{{Infobox family\n| name = Suellia\n}}\n== [[LINK2|History]] ==\n* A list item with a [[LINK3|link]]."
+    ]
+)
+def test_local_translation_keeps_masks(text):
+    """
+    Test that the local translation keeps the masks and the markup lines intact, with a fake model
+    :param text: masked text
+    :return:
+    """
+
+    translator = CTranslate2Translator.__new__(CTranslate2Translator)
+    translator.translate_sentences = lambda sentences, source_language, target_language: \
+        [sentence.upper() for sentence in sentences]
+
+    translation = translator.perform_translation(text, "en", "pt")
+
+    assert check_mask_integrity(text, translation).is_valid()
+    assert "{{Infobox family\n| name = Suellia\n}}" in translation
+    assert "[[LINK0|IMPERIAL TIMES]]" in translation
+    assert "* A LIST ITEM WITH A [[LINK3|LINK]]." in translation
+
+
+@pytest.mark.parametrize(
+    "text,expected",
+    [
+        ("== [[LINK2|History]] ==\nLived in [[LINK0|Rome]].<REF0>",
+         "== [[LINK2|HISTORY]] ==\nLIVED IN [[LINK0|ROME]].<REF0>"),
+        ("See [1] in [[LINK0|Rome]] and [[LINK1|Lazio]].<REF0>", "SEE [1] IN [[LINK0|ROME]] AND [[LINK1|LAZIO]].<REF0>")
+    ]
+)
+def test_local_translation_protects_placeholders(text, expected):
+    """
+    Test that the masks of the headings and the literal placeholders of the text survive a model rewriting the words
+    it doesn't know, as LINK
+    :param text: masked text
+    :param expected: expected translation
+    :return:
+    """
+
+    translator = CTranslate2Translator.__new__(CTranslate2Translator)
+    translator.translate_sentences = lambda sentences, source_language, target_language: \
+        [sentence.upper().replace("LINK", "LIGACAO") for sentence in sentences]
+
+    translation = translator.perform_translation(text, "en", "pt")
+
+    assert translation == expected
+    assert check_mask_integrity(text, translation).is_valid()
+
+
+@pytest.mark.parametrize(
+    "translation,expected",
+    [
+        ("VIVEU NOS [0].[1]", "VIVEU NOS [[LINK0|TEMPOS]].<REF0>"),
+        ("VIVEU NOS [0] [0].", "VIVEU NOS [[LINK0|TEMPOS]] .<REF0>"),
+        ("VIVEU NOS.", "VIVEU NOS.[[LINK0|TEMPOS]]<REF0>")
+    ]
+)
+def test_restore_masks(translation, expected):
+    """
+    Test that every mask appears exactly once after restoring the placeholders
+    :param translation: translated sentence with placeholders
+    :param expected: expected sentence with the masks
+    :return:
+    """
+
+    masks = [("LINK0", "times"), ("<REF0>", None)]
+
+    assert CTranslate2Translator.restore_masks(translation, masks, iter(["TEMPOS"])) == expected
@@ -0,0 +1,30 @@
+import pytest
+
+from src.config.config import Config
+from src.translation_engine.reference_translation import ReferenceTranslator
+
+
+@pytest.mark.parametrize(
+    "reference,expected",
+    [
+        ("<ref>{{cite web |url=https://example.org |title=Example |access-date=March 5, 2021 |language=English}}</ref>",
+         "<ref>{{Citar web |url=https://example.org |titulo=Example |acessodata=5 de março de 2021 |lingua=en}}</ref>"),
+        ("<ref>{{Cite book|last=Chase|year=1897|date=2 Sept 1897|pages=109–110}}</ref>",
+         "<ref>{{Citar livro|ultimo=Chase|ano=1897|data=2 de setembro de 1897|paginas=109–110}}</ref>"),
+        ("<ref>{{cite news|title={{lang|la|Suellius}}|date=2020-01-09}}</ref>",
+         "<ref>{{Citar notícia|titulo={{lang|la|Suellius}}|data=9 de janeiro de 2020}}</ref>"),
+        ("<ref>{{CIL|14|247}}.</ref>", "<ref>{{CIL|14|247}}.</ref>"),
+        ("<ref>Chase, pp. 109, 110.</ref>", "<ref>Chase, pp. 109, 110.</ref>")
+    ]
+)
+def test_translate_reference(reference, expected):
+    """
+    Test the local translation of citation templates
+    :param reference: reference in the source language
+    :param expected: expected reference in the target language
+    :return:
+    """
+
+    reference_translators = ReferenceTranslator.from_config(Config("src/config/config.json"))
+
+    assert reference_translators[("en", "pt")].translate(reference) == expected
@@ -1,3 +1,10 @@
+import pytest
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from src.translation_engine.translation import ChatGPTTranslator, LimitedTranslator, Translator
+
+
 # import pytest
 # from src.translation_engine.translation import ChatGPTTranslator
 # import langdetect
@@ -35,3 +42,104 @@
 #
 #     assert len(result) > 0
 #     assert langdetect.detect(result) == "pt"
+
+
+@pytest.mark.parametrize(
+    "content,size,expected",
+    [
+        ('{"translations": [{"id": 0, "text": "Brasil"}, {"id": 1, "text": "Estados Unidos"}]}', 2,
+         ["Brasil", "Estados Unidos"]),
+        ('{"translations": [{"id": 1, "text": "Estados Unidos"}, {"id": 0, "text": "Brasil"}]}', 2,
+         ["Brasil", "Estados Unidos"]),
+        ('{"translations": [{"id": 0, "text": "Brasil"}, {"id": 0, "text": "Brasilia"}, {"id": 5, "text": "x"}]}', 2,
+         [None, None]),
+        ('{"translations": [{"id": 0, "text": ""}, {"id": 1, "text": "Estados\\nUnidos"}]}', 2, [None, None]),
+        ("not a json", 2, [None, None])
+    ]
+)
+def test_parse_batch_translation(content, size, expected):
+    """
+    Test the validation of the structured answer of a batch translation
+    :param content: answer of the model
+    :param size: number of texts in the batch
+    :param expected: expected translations
+    :return:
+    """
+
+    assert ChatGPTTranslator.parse_batch_translation(content, size) == expected
+
+
+class FakeConfig:
+    """
+    Configuration with the prompts of the tests
+    """
+
+    config = {"translation_prompt": {"text": "Translate the text from {source_language} to {target_language}."},
+              "mask_rules": ["Keep the masks.", "Keep the headings."],
+              "translation_examples": {"en-pt": [{"text": "[[LINK0|Brazil]]", "translation": "[[LINK0|Brasil]]"}]},
+              "terminology": {"en-pt": {"See also": "Ver também"}}}
+
+
+@pytest.mark.parametrize(
+    "translation_type,expected",
+    [
+        ("text", "Translate the text from en to pt.\n\nKeep the masks.\nKeep the headings.\n\n"
+                 "Examples:\nText:\n[[LINK0|Brazil]]\nTranslation:\n[[LINK0|Brasil]]\n\n"
+                 "Use these translations for the following section headings and names, where they are used as such:\n"
+                 "See also => Ver também"),
+        ("title", "Translate the text from en to pt.\n\n"
+                  "Use these translations for the following section headings and names, where they are used as such:\n"
+                  "See also => Ver também")
+    ]
+)
+def test_system_prompt(monkeypatch, translation_type, expected):
+    """
+    Test that the system prompt of a translation type and language pair is compiled once
+    :param monkeypatch: pytest monkeypatch fixture
+    :param translation_type: content to translate
+    :param expected: expected system prompt
+    :return:
+    """
+
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    translator = ChatGPTTranslator(config=FakeConfig())
+
+    assert translator.system_prompt(translation_type, "en", "pt") == expected
+    assert translator.system_prompt(translation_type, "en", "pt") is translator.system_prompt(translation_type, "en",
+                                                                                               "pt")
+
+
+class SlowTranslator(Translator):
+    """
+    Translator that counts the requests running at once
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.running = 0
+        self.max_running = 0
+
+    def perform_translation(self, text, source_language="english", target_language="portuguese",
+                            translation_type="text"):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(0.01)
+        with self.lock:
+            self.running -= 1
+        return text
+
+
+def test_limited_translator():
+    """
+    Test that the requests running at once are bounded, whatever the number of threads
+    :return:
+    """
+
+    backend = SlowTranslator()
+    translator = LimitedTranslator(backend, max_concurrent_requests=2)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        translations = list(executor.map(translator.perform_translation, [str(i) for i in range(16)]))
+
+    assert translations == [str(i) for i in range(16)]
+    assert backend.max_running <= 2
@@ -0,0 +1,64 @@
+import pytest
+import sqlite3
+
+from src.utils.job_queue import JobQueue
+
+
+def test_claim_complete(tmp_path):
+    """
+    Test that each page is claimed by a single worker, in priority order
+    :param tmp_path: temporary directory
+    :return:
+    """
+
+    queue = JobQueue(str(tmp_path / "queue.db"))
+    work_list = [("Brazil", "en", "Brasil", "pt"), ("Test", "en", "Teste", "pt")]
+    assert queue.enqueue(work_list, {("Test", "en", "Teste", "pt"): -1}) == 2
+    assert queue.enqueue(work_list) == 0
+
+    first_job_id, first_item = queue.claim("worker-1")
+    second_job_id, second_item = queue.claim("worker-2")
+    assert first_item == ("Test", "en", "Teste", "pt")
+    assert second_item == ("Brazil", "en", "Brasil", "pt")
+    assert queue.claim("worker-3") is None
+
+    assert queue.heartbeat(first_job_id, "worker-1")
+    assert not queue.complete(first_job_id, "worker-2")
+    assert queue.complete(first_job_id, "worker-1")
+    assert queue.counts() == {"pending": 0, "leased": 1, "done": 1, "failed": 0}
+
+
+def test_expired_lease(tmp_path):
+    """
+    Test that a page whose lease expired is queued again, until it reaches the maximum number of attempts
+    :param tmp_path: temporary directory
+    :return:
+    """
+
+    queue = JobQueue(str(tmp_path / "queue.db"), lease_seconds=-1, max_attempts=2)
+    queue.enqueue([("Brazil", "en", "Brasil", "pt")])
+
+    job_id, _ = queue.claim("worker-1")
+    assert queue.claim("worker-2")[0] == job_id
+    assert not queue.heartbeat(job_id, "worker-1")
+    assert queue.claim("worker-3") is None
+    assert queue.counts()["failed"] == 1
+
+
+def test_locked_queue(tmp_path):
+    """
+    Test that a worker that can't lock the queue file gets the lock error
+    :param tmp_path: temporary directory
+    :return:
+    """
+
+    queue = JobQueue(str(tmp_path / "queue.db"), busy_timeout=0.1)
+    other_worker = sqlite3.connect(str(tmp_path / "queue.db"), isolation_level=None)
+    other_worker.execute("BEGIN IMMEDIATE")
+
+    with pytest.raises(sqlite3.OperationalError, match="database is locked"):
+        queue.counts()
+
+    other_worker.execute("ROLLBACK")
+    other_worker.close()
+    assert queue.counts() == {"pending": 0, "leased": 0, "done": 0, "failed": 0}
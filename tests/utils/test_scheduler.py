@@ -0,0 +1,49 @@
+import pytest
+
+from src.utils.scheduler import CostEstimator, WorkScheduler
+
+
+@pytest.mark.parametrize(
+    "metadata,priorities,expected",
+    [
+        ({("Small", "en", "Pequeno", "pt"): {"length": 4000}, ("Big", "en", "Grande", "pt"): {"length": 400000},
+          ("Medium", "en", "Medio", "pt"): {"length": 40000}},
+         {}, ["Big", "Medium", "Small"]),
+        ({("Small", "en", "Pequeno", "pt"): {"length": 4000}, ("Big", "en", "Grande", "pt"): {"length": 400000},
+          ("Medium", "en", "Medio", "es"): {"length": 40000}, ("Tiny", "en", "Minusculo", "es"): {"length": 400}},
+         {}, ["Big", "Medium", "Tiny", "Small"]),
+        ({("Small", "en", "Pequeno", "pt"): {"length": 4000}, ("Big", "en", "Grande", "pt"): {"length": 400000}},
+         {("Small", "en", "Pequeno", "pt"): 0, ("Big", "en", "Grande", "pt"): 1}, ["Small", "Big"])
+    ]
+)
+def test_schedule(metadata, priorities, expected):
+    """
+    Test the order of the work list: longest first, fair between target languages and by priority class
+    :param metadata: metadata of each work item
+    :param priorities: priority class of each work item
+    :param expected: expected order of the source pages
+    :return:
+    """
+
+    scheduler = WorkScheduler(CostEstimator())
+
+    work_list = scheduler.schedule(list(metadata), metadata, priorities)
+
+    assert [item[0] for item in work_list] == expected
+
+
+def test_report():
+    """
+    Test the report of the predicted against the actual durations
+    :return:
+    """
+
+    item = ("Big", "en", "Grande", "pt")
+    scheduler = WorkScheduler(CostEstimator(base_seconds=1.0, seconds_per_token=0.0))
+    scheduler.schedule([item], {item: {"length": 400000}})
+    scheduler.record_duration(item, 3.0)
+
+    report = scheduler.report()
+    assert report["predicted"] == 1.0
+    assert report["actual"] == 3.0
+    assert report["ratio"] == 3.0
@@ -0,0 +1,34 @@
+import pytest
+
+from src.wikipedia_wrapper.batch_queries import parse_query_pages
+
+
+@pytest.mark.parametrize(
+    "responses,titles,expected",
+    [
+        ([{"continue": {"llcontinue": "155|fr"},
+           "query": {"normalized": [{"from": "Atlantic_Ocean", "to": "Atlantic Ocean"}],
+                     "redirects": [{"from": "USA", "to": "United States"}],
+                     "pages": [{"title": "Atlantic Ocean", "langlinks": [{"lang": "es", "title": "Océano Atlántico"}]},
+                               {"title": "United States", "langlinks": [{"lang": "pt", "title": "Estados Unidos"}]},
+                               {"title": "Balblals", "missing": True}]}},
+          {"query": {"pages": [{"title": "Atlantic Ocean", "langlinks": [{"lang": "pt", "title": "Oceano Atlântico"}]},
+                               {"title": "United States"},
+                               {"title": "Balblals", "missing": True}]}}],
+         ["Atlantic_Ocean", "USA", "Balblals"],
+         {"Atlantic_Ocean": {"title": "Atlantic Ocean", "langlinks": [{"lang": "es", "title": "Océano Atlántico"},
+                                                                      {"lang": "pt", "title": "Oceano Atlântico"}]},
+          "USA": {"title": "United States", "langlinks": [{"lang": "pt", "title": "Estados Unidos"}]},
+          "Balblals": None})
+    ]
+)
+def test_parse_query_pages(responses, titles, expected):
+    """
+    Test the merge of the continuations of a batched query and the mapping back to the requested titles
+    :param responses: answers of the query and its continuations
+    :param titles: requested titles
+    :param expected: expected pages by requested title
+    :return:
+    """
+
+    assert parse_query_pages(responses, titles) == expected
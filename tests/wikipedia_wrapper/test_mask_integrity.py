@@ -0,0 +1,56 @@
+import pytest
+
+from src.wikipedia_wrapper.mask_integrity import check_mask_integrity, split_paragraphs
+
+
+@pytest.mark.parametrize(
+    "source_text,translated_text,valid,missing,duplicated,unknown",
+    [
+        ("Lived in [[LINK0|imperial times]].<REF0> At [[LINK1|Ligures]].<REF1>",
+         "Viveu nos [[LINK0|tempos imperiais]].<REF0> Em [[LINK1|Ligures]].<REF1>", True, [], [], []),
+        ("Lived in [[LINK0|imperial times]].<REF0> At [[LINK1|Ligures]].<REF1>",
+         "Viveu nos tempos imperiais.<REF0> Em [[LINK1|Ligures]].<REF1><REF1>", False, ["LINK0"], ["REF1"], []),
+        ("At [[LINK1|Ligures]].<REF1>", "Em [[LINK7|Ligures]].<REF1>", False, ["LINK1"], [], ["LINK7"]),
+        ("[[LINK0|a]] [[LINK1|b]] [[LINK2|c]] [[LINK3|d]]", "[[LINK3|d]] [[LINK2|c]] [[LINK1|b]] [[LINK0|a]]",
+         False, [], [], []),
+        ("[[LINK0|a]] and [[LINK1|b]]", "[[LINK1|b]] e [[LINK0|a]]", True, [], [], [])
+    ]
+)
+def test_check_mask_integrity(source_text, translated_text, valid, missing, duplicated, unknown):
+    """
+    Test the check of the masks kept by the translation
+    :param source_text: masked text
+    :param translated_text: translated text
+    :param valid: whether the masks are intact
+    :param missing: expected missing masks
+    :param duplicated: expected duplicated masks
+    :param unknown: expected unknown masks
+    :return:
+    """
+
+    report = check_mask_integrity(source_text, translated_text)
+
+    assert report.is_valid() == valid
+    assert report.missing == missing
+    assert report.duplicated == duplicated
+    assert report.unknown == unknown
+
+
+@pytest.mark.parametrize(
+    "text,size",
+    [
+        ("First [[LINK0|a]].\n\nSecond.\n \n\nThird.", 3), ("Single paragraph\nin two lines.", 1)
+    ]
+)
+def test_split_paragraphs(text, size):
+    """
+    Test the split of a text in paragraphs
+    :param text: text to split
+    :param size: expected number of paragraphs
+    :return:
+    """
+
+    paragraphs = split_paragraphs(text)
+
+    assert len(paragraphs) == size
+    assert "".join(paragraphs) == text
@@ -93,4 +93,58 @@ def test_find_references(text):
     assert non_prose_elements.references[2].element_id == "REF2"
     assert non_prose_elements.references[2].text == "<ref name=\"PW Suellius 2\">''PW'', Suellius 2.</ref>"
     assert non_prose_elements.references[-1].element_id == f"REF{len(non_prose_elements.references)-1}"
-    assert non_prose_elements.references[-1].text == "<ref name=\"PW Suellius 2\"/>"
+    assert non_prose_elements.references[-1].text == "<ref>''New College Latin & English Dictionary'', ''s.v. quartus''.</ref>"
+    assert text.count("<REF2>") == 2
+
+
+@pytest.mark.parametrize(
+    "text,masked_text,references",
+    [
+        ("A<ref>Chase, p. 1.</ref> B<ref>Chase, p. 1.</ref> C<ref>Other.</ref>", "A<REF0> B<REF0> C<REF1>",
+         ["<ref name=\"autoref5817e0e1\">Chase, p. 1.</ref>", "<ref>Other.</ref>"]),
+        ("Z<ref>New.</ref> A<ref>Chase, p. 1.</ref> B<ref>Chase, p. 1.</ref>", "Z<REF0> A<REF1> B<REF1>",
+         ["<ref>New.</ref>", "<ref name=\"autoref5817e0e1\">Chase, p. 1.</ref>"]),
+        ("A<ref name=\"x\" /> B<ref name=\"x\">Body.</ref> C<ref name='x'/> D", "A<REF0> B<REF0> C<REF0> D",
+         ["<ref name=\"x\">Body.</ref>"]),
+        ("A<ref name=\"x\">Body.</ref> B<ref>Body.</ref>", "A<REF0> B<REF0>", ["<ref name=\"x\">Body.</ref>"]),
+        ("A<ref group=\"note\">Same.</ref> B<ref>Same.</ref>", "A<REF0> B<REF1>",
+         ["<ref group=\"note\">Same.</ref>", "<ref>Same.</ref>"]),
+        ("A<ref group=\"note\" name=\"n1\">Note.</ref> B<ref name=\"n1\">Citation.</ref> C<ref group=\"note\" name=\"n1\"/>",
+         "A<REF0> B<REF1> C<REF0>", ["<ref group=\"note\" name=\"n1\">Note.</ref>", "<ref name=\"n1\">Citation.</ref>"])
+    ]
+)
+def test_deduplicate_references(text, masked_text, references):
+    """
+    Test that the repeated references share a single mask, named so they can be cited again
+    :param text: given sample text
+    :param masked_text: expected masked text
+    :param references: expected texts of the references
+    :return:
+    """
+
+    non_prose_elements = NonProseElements()
+
+    assert non_prose_elements.pre_process_references(text) == masked_text
+    assert [reference.text for reference in non_prose_elements.references] == references
+
+
+@pytest.mark.parametrize(
+    "reference,short_reference",
+    [
+        ("<ref name=\"x\">Body.</ref>", "<ref name=\"x\" />"),
+        ("<ref group=\"note\" name=\"n1\">Note.</ref>", "<ref group=\"note\" name=\"n1\" />"),
+        ("<ref group=note>Same.</ref>", "<ref group=\"note\" name=\"autoref38ebb2f9\" />")
+    ]
+)
+def test_short_reference(reference, short_reference):
+    """
+    Test that a reference cited again keeps its group
+    :param reference: definition of the reference
+    :param short_reference: expected short form of the reference
+    :return:
+    """
+
+    non_prose_elements = NonProseElements()
+    non_prose_elements.pre_process_references(reference + reference)
+
+    assert non_prose_elements.references[0].get_short_reference() == short_reference
@@ -0,0 +1,63 @@
+from src.wikipedia_wrapper.page_publisher import PagePublisher
+
+
+class FakeWikidata:
+    """
+    Wikidata layer that writes nothing
+    """
+
+    def queue_sitelink(self, *args):
+        pass
+
+    def flush(self):
+        return {}
+
+
+class FakeSite:
+    """
+    Site with only a language code
+    """
+
+    code = "en"
+
+
+class FakePage:
+    """
+    Page whose save fails with the given error
+    """
+
+    def __init__(self, title, revision=1, error=None):
+        self.site = FakeSite()
+        self.latest_revision_id = revision
+        self.error = error
+        self._title = title
+
+    def title(self):
+        return self._title
+
+    def save(self, summary):
+        if self.error is not None:
+            raise self.error
+
+
+def test_publish(tmp_path):
+    """
+    Test that a failing save doesn't block the publisher, and that a page is published again only from a new revision
+    :param tmp_path: temporary folder
+    :return:
+    """
+
+    status_db = str(tmp_path / "publish_status.db")
+    publisher = PagePublisher(FakeWikidata(), status_db=status_db)
+    publisher.submit(FakePage("Brasil", error=ConnectionError("connection lost")), "summary", FakePage("Brazil"), "pt")
+    publisher.submit(FakePage("Portugal"), "summary", FakePage("Portugal"), "pt")
+    publisher.close()
+
+    assert not publisher.is_published("Brasil", "pt", 1)
+    assert publisher.is_published("Portugal", "pt", 1)
+
+    # the status is shared through the database, the refreshed page comes from a new revision
+    publisher = PagePublisher(FakeWikidata(), status_db=status_db)
+    assert publisher.is_published("Portugal", "pt", 1)
+    assert not publisher.is_published("Portugal", "pt", 2)
+    publisher.close()
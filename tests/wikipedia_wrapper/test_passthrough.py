@@ -0,0 +1,37 @@
+import pytest
+
+from src.wikipedia_wrapper.passthrough import PassthroughClassifier
+
+
+TABLE = "{| class=\"wikitable\"\n|-\n! Season !! Club !! Apps !! Goals\n|-\n| 2019 || [[LINK3|Flamengo]] || 30 || 12\n" \
+        "|-\n| 2020 || [[LINK4|Santos]] || 28 || 9\n|}\n"
+
+
+@pytest.mark.parametrize(
+    "text,passthrough",
+    [
+        ("'''Brazil''' is a country<REF0>.\n", [False]),
+        ("== Career ==\nHe played for two clubs.\n\n" + TABLE, [False, True]),
+        ("Prose before.\n<math>\nx^2 + y^2 = z^2\n</math>\nProse after.\n", [False]),
+        ("Prose.\n\n<gallery>\nFile:A.jpg|The first picture of the gallery\nFile:B.jpg|The second picture\n"
+         "File:C.jpg|The third picture of the gallery\nFile:D.jpg|The fourth picture of the gallery\n</gallery>\n"
+         "More prose.\n", [False, True, False]),
+        ("== See also ==\n* [[LINK1|Football in Brazil]]\n* [[LINK2|Santos FC]]\n", [False, True]),
+        ("== References ==\n{{Reflist|30em}}\n", [False, True]),
+        ("{{Coord|22|54|S|43|14|W|display=title}}\n<REF1><REF2>\n", [True]),
+        ("{{Infobox person\n| name = Pelé\n| caption = Pelé in 1960\n}}\nText.\n", [False])
+    ]
+)
+def test_split(text, passthrough):
+    """
+    Test the split of a masked text in runs to translate and runs passing through
+    :param text: masked wiki text
+    :param passthrough: expected classification of the runs
+    :return:
+    """
+
+    classifier = PassthroughClassifier(templates=["Coord", "Reflist"], min_tokens=30)
+    runs = classifier.split(text)
+
+    assert [run_passthrough for _, run_passthrough in runs] == passthrough
+    assert "".join(run for run, _ in runs) == text
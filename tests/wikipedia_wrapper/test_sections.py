@@ -0,0 +1,27 @@
+import pytest
+
+from src.wikipedia_wrapper.sections import split_sections
+
+
+@pytest.mark.parametrize(
+    "text,headings",
+    [
+        ("'''Brazil''' is a country.\n\n== History ==\nText.\n=== Colonial period ===\nMore text.\n== See also ==\n",
+         ["", "History", "Colonial period", "See also"]),
+        ("Only a lead section with a = sign.", [""]),
+        ("== [[LINK0|History]] ==\nText.", ["", "[[LINK0|History]]"])
+    ]
+)
+def test_split_sections(text, headings):
+    """
+    Test the split of a wiki text in sections
+    :param text: wiki text
+    :param headings: expected headings of the sections
+    :return:
+    """
+
+    sections = split_sections(text)
+
+    assert [section.heading for section in sections] == headings
+    assert "".join(section.text for section in sections) == text
+    assert len({section.source_hash() for section in sections}) == len(sections)
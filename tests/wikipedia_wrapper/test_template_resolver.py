@@ -0,0 +1,74 @@
+import pytest
+
+from src.wikipedia_wrapper.template_resolver import TemplateResolver, find_template_names
+
+
+class FakeSite:
+    """
+    Site with only a language code, the resolutions of the tests come from the cache
+    """
+
+    def __init__(self, code):
+        self.code = code
+
+
+@pytest.mark.parametrize(
+    "text,names",
+    [
+        ("{{Infobox country|name=Brazil|flag={{flag|BRA}}}} text {{citation needed}}",
+         {"Infobox country", "Flag", "Citation needed"}),
+        ("{{DEFAULTSORT:Brazil}} {{#if:x|y}} {{!}} {{PAGENAME}} {{subst:foo}}", set()),
+        ("No templates, only a [[LINK0|link]].", set())
+    ]
+)
+def test_find_template_names(text, names):
+    """
+    Test the extraction of the template names, parser functions and magic words are skipped
+    :param text: wiki text
+    :param names: expected template names
+    :return:
+    """
+
+    assert find_template_names(text) == names
+
+
+@pytest.mark.parametrize(
+    "text,expected",
+    [
+        ("{{Infobox country|name=Brazil|flag={{flag|BRA}}}}", "{{Info/País|name=Brazil|flag={{Bandeira|BRA}}}}"),
+        ("Text{{Citation needed|date=May 2020}} more.", "Text{{Carece de fontes}} more."),
+        ("A {{Use dmy dates}}list.", "A list."),
+        ("{{DEFAULTSORT:Brazil}}", "{{DEFAULTSORT:Brazil}}"),
+        ("{{Unknown}}", "{{Unknown}}")
+    ]
+)
+def test_apply(text, expected):
+    """
+    Test the renaming, replacement and stripping of the templates
+    :param text: wiki text in the source language
+    :param expected: expected wiki text
+    :return:
+    """
+
+    resolver = TemplateResolver(replacements={"pt": {"Citation needed": "{{Carece de fontes}}"}})
+    resolutions = {"Infobox country": "Info/País", "Flag": "Bandeira", "Citation needed": None,
+                   "Use dmy dates": None}
+
+    assert resolver.apply(text, resolutions, "pt") == expected
+
+
+def test_cache(tmp_path):
+    """
+    Test that the resolutions persisted by other resolvers, e.g. of other processes, are read from the cache file
+    without querying the wiki, and that none of them is lost
+    :param tmp_path: temporary folder
+    :return:
+    """
+
+    cache_file = str(tmp_path / "cache" / "templates.db")
+    TemplateResolver(cache_file).persist("en-pt", {"Infobox country": "Info/País"})
+    TemplateResolver(cache_file).persist("en-pt", {"Use dmy dates": None})
+    resolver = TemplateResolver(cache_file)
+
+    assert resolver.resolve({"Infobox country", "Use dmy dates"}, FakeSite("en"), FakeSite("pt")) == \
+        {"Infobox country": "Info/País", "Use dmy dates": None}
@@ -0,0 +1,58 @@
+import pytest
+
+from src.utils.rate_governor import RateGovernor
+from src.wikipedia_wrapper.wikidata_sitelinks import WikidataSitelinks
+
+
+class FakeRepo:
+    """
+    Wikidata repository recording the edits, the edits of the titles in fail_titles fail
+    """
+
+    def __init__(self, fail_titles=()):
+        self.edits = []
+        self.fail_titles = set(fail_titles)
+
+    def editEntity(self, entity, data, summary):
+        if entity["title"] in self.fail_titles:
+            raise ConnectionError("connection lost")
+        self.edits.append((entity["site"], entity["title"], data["sitelinks"], summary))
+
+
+def test_flush():
+    """
+    Test that the queued sitelinks of a page are written in a single edit, and nothing is written before the flush
+    :return:
+    """
+
+    repo = FakeRepo()
+    wikidata = WikidataSitelinks(repo, "{target_language}wiki", "Adding {target_language}", RateGovernor(0))
+    wikidata.queue_sitelink("Brazil", "en", "Brasil", "pt")
+    wikidata.queue_sitelink("Brazil", "en", "Brasil", "es")
+    wikidata.queue_sitelink("Portugal", "en", "Portugal", "pt")
+
+    assert repo.edits == []
+    assert wikidata.flush() == {("enwiki", "Brazil"): {"ptwiki": "Brasil", "eswiki": "Brasil"},
+                                ("enwiki", "Portugal"): {"ptwiki": "Portugal"}}
+    assert repo.edits == [("enwiki", "Brazil", [{"site": "ptwiki", "title": "Brasil"},
+                                                {"site": "eswiki", "title": "Brasil"}], "Adding pt, es"),
+                          ("enwiki", "Portugal", [{"site": "ptwiki", "title": "Portugal"}], "Adding pt")]
+    assert wikidata.flush() == {}
+
+
+def test_flush_failure():
+    """
+    Test that the sitelinks not written are queued again when an edit fails
+    :return:
+    """
+
+    repo = FakeRepo(fail_titles=["Portugal"])
+    wikidata = WikidataSitelinks(repo, "{target_language}wiki", "Adding {target_language}", RateGovernor(0))
+    wikidata.queue_sitelink("Brazil", "en", "Brasil", "pt")
+    wikidata.queue_sitelink("Portugal", "en", "Portugal", "pt")
+
+    with pytest.raises(ConnectionError):
+        wikidata.flush()
+
+    assert len(repo.edits) == 1
+    assert wikidata.pending_sitelinks == {("enwiki", "Portugal"): {"ptwiki": "Portugal"}}
@@ -15,7 +15,7 @@ from src.wikipedia_wrapper.wikipedia_translator import WikipediaTranslator
 )
 def test_retrieve_page_shouldpass(page_title, language):
     config = Config("src/config/config.json")
-    wikipedia_translator = WikipediaTranslator(config, ["en", "pt"])
+    wikipedia_translator = WikipediaTranslator(config, ["en", "pt"], should_save=False)
 
     page = wikipedia_translator.retrieve_page(page_title, language)
 
@@ -32,7 +32,7 @@ def test_retrieve_page_shouldpass(page_title, language):
 )
 def test_retrieve_page_shouldfail(page_title, language):
     config = Config("src/config/config.json")
-    wikipedia_translator = WikipediaTranslator(config, ["en", "pt"])
+    wikipedia_translator = WikipediaTranslator(config, ["en", "pt"], should_save=False)
 
     try:
         wikipedia_translator.retrieve_page(page_title, language)
@@ -55,7 +55,7 @@ def test_preprocess_text(text, language):
     """
 
     config = Config("src/config/config.json")
-    wikipedia_translator = WikipediaTranslator(config, ["en", "pt"])
+    wikipedia_translator = WikipediaTranslator(config, ["en", "pt"], should_save=False)
 
     page = Page(source=Site(language, 'wikipedia'), title="Test")
     page.text = text
@@ -82,7 +82,7 @@ def test_find_hyperlinks(text, language):
     """
 
     config = Config("src/config/config.json")
-    wikipedia_translator = WikipediaTranslator(config, ["en", "pt"])
+    wikipedia_translator = WikipediaTranslator(config, ["en", "pt"], should_save=False)
 
     links = wikipedia_translator.find_hyperlinks(text)
     assert type(links) == list
@@ -106,7 +106,7 @@ def test_postprocess_text(text, source_language, target_language):
     """
 
     config = Config("src/config/config.json")
-    wikipedia_translator = WikipediaTranslator(config, ["en", "pt"])
+    wikipedia_translator = WikipediaTranslator(config, ["en", "pt"], should_save=False)
 
     page = Page(source=Site(source_language, 'wikipedia'), title="Test")
     page.text = text
@@ -136,7 +136,7 @@ def test_get_page_target_language(page_title, source_language, target_page_tile,
     """
 
     config = Config("src/config/config.json")
-    wikipedia_translator = WikipediaTranslator(config, ["en", "pt"])
+    wikipedia_translator = WikipediaTranslator(config, ["en", "pt"], should_save=False)
 
     page = wikipedia_translator.retrieve_page(page_title, source_language)
 
@@ -0,0 +1,252 @@
+import pytest
+
+from src.config.config import Config
+from src.wikipedia_wrapper import wikipedia_translator
+from src.wikipedia_wrapper.wikipedia_translator import WikipediaTranslator
+
+
+class FakeRequest:
+    """
+    Request answering a canned response
+    """
+
+    def __init__(self, response):
+        self.response = response
+
+    def submit(self):
+        return self.response
+
+
+class FakeSite:
+    """
+    Site answering the query requests from canned pages, the requested titles are recorded
+    """
+
+    def __init__(self, code, pages=None):
+        self.code = code
+        self.pages = pages or {}
+        self.requested_titles = []
+        self.preloaded = []
+
+    def preloadpages(self, pages, groupsize=50, langlinks=False):
+        self.preloaded.append(([page.title() for page in pages], groupsize, langlinks))
+        for page in pages:
+            page.text = f"Text of {page.title()}."
+            yield page
+
+    def simple_request(self, **params):
+        self.requested_titles.extend(params["titles"])
+        return FakeRequest({"query": {"pages": [{"title": title, **self.pages[title]} if title in self.pages
+                                                else {"title": title, "missing": True}
+                                                for title in params["titles"]]}})
+
+
+class FakeLink:
+    """
+    Language link of a page
+    """
+
+    def __init__(self, site, title):
+        self.site = site
+        self.title = title
+
+
+class FakePage:
+    """
+    Page with a text and a revision, built in memory
+    """
+
+    def __init__(self, source=None, title="", text="", revision=1, langlinks=()):
+        self.site = source
+        self._title = title
+        self.text = text
+        self.latest_revision_id = revision
+        self._langlinks = list(langlinks)
+
+    def title(self):
+        return self._title
+
+    def langlinks(self):
+        return self._langlinks
+
+
+class FakeTranslator:
+    """
+    Translator wrapping the texts in PT(...), the translated texts are recorded
+    """
+
+    def __init__(self):
+        self.texts = []
+
+    def perform_translation(self, text, source_language="en", target_language="pt", translation_type="text"):
+        self.texts.append(text)
+        return f"PT({text})"
+
+    def perform_batch_translation(self, texts, source_language="en", target_language="pt", translation_type="title"):
+        return [f"PT({text})" for text in texts]
+
+
+@pytest.fixture
+def make_translator(monkeypatch):
+    """
+    Build a WikipediaTranslator on fake sites and a fake translator, without any request to the wikis
+    :param monkeypatch: pytest monkeypatch fixture
+    :return: function building the translator from the fake sites by language and the wiki languages
+    """
+
+    def make(sites, languages=("en", "pt")):
+        monkeypatch.setattr(wikipedia_translator.pywikibot, "Site",
+                            lambda code, project: sites.setdefault(code, FakeSite(code)))
+        monkeypatch.setattr(wikipedia_translator, "build_translator", lambda config: FakeTranslator())
+        monkeypatch.setattr(wikipedia_translator, "Page", FakePage)
+        monkeypatch.setattr(wikipedia_translator.pywikibot, "Page", FakePage)
+
+        config = Config("src/config/config.json")
+        config.config["template_cache_file"] = None
+        return WikipediaTranslator(config, list(languages), verbose=False, should_save=False)
+
+    return make
+
+
+@pytest.mark.parametrize(
+    "work_list,expected,target_titles",
+    [
+        ([("Ocean", "en", "Oceano", "pt"), ("Missing", "en", "Ausente", "pt")], [("Ocean", "en", "Oceano", "pt")],
+         ["Oceano"]),
+        ([("Ocean", "en", None, "pt"), ("Brazil", "en", None, "pt")], [("Ocean", "en", "PT(Ocean)", "pt")],
+         ["PT(Ocean)"]),
+        ([("Ocean", "en", "Oceano", "pt"), ("Lisbon", "en", "Lisboa", "pt")], [("Ocean", "en", "Oceano", "pt")],
+         ["Oceano", "Lisboa"])
+    ]
+)
+def test_prepare_work_list(make_translator, work_list, expected, target_titles):
+    """
+    Test that the pages missing in the source wiki, already translated or whose target title is taken are dropped,
+    with a single query for each wiki
+    :param make_translator: fixture building the translator
+    :param work_list: pages to translate
+    :param expected: expected work list
+    :param target_titles: target titles expected to be checked in the target wiki
+    :return:
+    """
+
+    sites = {"en": FakeSite("en", {"Ocean": {"length": 10},
+                                   "Brazil": {"length": 20, "langlinks": [{"lang": "pt", "title": "Brasil"}]},
+                                   "Lisbon": {"length": 30}}),
+             "pt": FakeSite("pt", {"Lisboa": {"length": 40}})}
+    translator = make_translator(sites)
+
+    assert translator.prepare_work_list(work_list) == expected
+    assert sites["en"].requested_titles == [item[0] for item in work_list]
+    assert sites["pt"].requested_titles == target_titles
+
+
+def test_preload_pages(make_translator):
+    """
+    Test that the source pages are preloaded at once with their langlinks, and then retrieved without a request
+    :param make_translator: fixture building the translator
+    :return:
+    """
+
+    sites = {"en": FakeSite("en")}
+    translator = make_translator(sites)
+
+    translator.preload_pages([("Ocean", "en", "Oceano", "pt"), ("Lisbon", "en", "Lisboa", "pt"),
+                              ("Ocean", "en", "Océan", "fr")])
+
+    assert sites["en"].preloaded == [(["Ocean", "Lisbon"], translator.batch_size, True)]
+    assert translator.retrieve_page("Ocean", "en").text == "Text of Ocean."
+    assert ("en", "Ocean") not in translator.page_cache
+
+
+def test_translate_page_multi(make_translator):
+    """
+    Test that a page translated to many languages is fetched and masked once, its links are resolved once for all the
+    pending languages and the languages where it already exists are skipped
+    :param make_translator: fixture building the translator
+    :return:
+    """
+
+    sites = {"en": FakeSite("en", {"Atlantic Ocean": {"langlinks": [{"lang": "pt", "title": "Oceano Atlântico"},
+                                                                    {"lang": "es", "title": "Océano Atlántico"}]}})}
+    translator = make_translator(sites, ["en", "pt", "es", "fr"])
+    translator.page_cache[("en", "Ocean")] = FakePage(sites["en"], "Ocean", "The [[Atlantic Ocean]] is large.",
+                                                      langlinks=[FakeLink("wikipedia:fr", "Océan")])
+
+    calls = []
+    retrieve_page = translator.retrieve_page
+    translator.retrieve_page = lambda title, language: calls.append("retrieve") or retrieve_page(title, language)
+    pre_process_text = translator.pre_process_text
+    translator.pre_process_text = lambda page: calls.append("pre_process") or pre_process_text(page)
+
+    translations = translator.translate_page_multi("Ocean", "en", ["pt", "es", "fr"],
+                                                   {"pt": "Oceano", "es": "Océano"})
+
+    assert calls == ["retrieve", "pre_process"]
+    assert sites["en"].requested_titles == ["Atlantic Ocean"]
+    assert translations["fr"] is None
+    assert translations["pt"][0].text == "PT(The [[Oceano Atlântico|Atlantic Ocean]] is large.)"
+    assert translations["es"][0].text == "PT(The [[Océano Atlántico|Atlantic Ocean]] is large.)"
+    assert [translations[language][1].target_title for language in ("pt", "es")] == ["Oceano", "Océano"]
+
+
+def test_refresh_page(make_translator):
+    """
+    Test that the refresh of a page translates only its changed sections, keeps the references defined in the reused
+    sections and resolves only the links not resolved before
+    :param make_translator: fixture building the translator
+    :return:
+    """
+
+    sites = {"en": FakeSite("en", {"Atlantic Ocean": {"langlinks": [{"lang": "pt", "title": "Oceano Atlântico"}]},
+                                   "Brazil": {"langlinks": [{"lang": "pt", "title": "Brasil"}]}})}
+    translator = make_translator(sites)
+
+    lead = "The [[Atlantic Ocean]] is large.<ref>Chase, p. 1.</ref>\n"
+    translator.page_cache[("en", "Ocean")] = FakePage(sites["en"], "Ocean", lead + "== History ==\nIt is old.\n")
+    _, record = translator.translate_page_with_record("Ocean", "en", "pt", "Oceano")
+    assert sites["en"].requested_titles == ["Atlantic Ocean"]
+
+    sites["en"].requested_titles.clear()
+    translator.translator.texts.clear()
+    history = "== History ==\nThe [[Atlantic Ocean]] is older than [[Brazil]].<ref>Chase, p. 1.</ref>\n"
+    translator.page_cache[("en", "Ocean")] = FakePage(sites["en"], "Ocean", lead + history, revision=2)
+    new_page, new_record = translator.refresh_page(record)
+
+    # the lead is reused, the reference it defined got a name since, so the changed section defines it again
+    assert translator.translator.texts == ["== History ==\nThe [[LINK0|Atlantic Ocean]] is older than "
+                                           "[[LINK2|Brazil]].<REF0>"]
+    assert sites["en"].requested_titles == ["Brazil"]
+    assert new_page.text == record.sections[0]["translation"] + \
+        "PT(== History ==\nThe [[Oceano Atlântico|Atlantic Ocean]] is older than [[Brasil|Brazil]]." \
+        "<ref name=\"autoref5817e0e1\">Chase, p. 1.</ref>)\n"
+    assert new_record.revision_id == 2
+    assert new_record.links == {"Atlantic Ocean": "Oceano Atlântico", "Brazil": "Brasil"}
+
+    # the page is not refreshed again from the same revision
+    translator.page_cache[("en", "Ocean")] = FakePage(sites["en"], "Ocean", lead + history, revision=2)
+    assert translator.refresh_page(new_record) is None
+
+
+def test_refresh_page_reused_reference(make_translator):
+    """
+    Test that a reference defined in a reused section is cited by its short form in the changed sections
+    :param make_translator: fixture building the translator
+    :return:
+    """
+
+    translator = make_translator({})
+
+    lead = "The ocean is large.<ref>Chase, p. 1.</ref> It is deep.<ref>Chase, p. 1.</ref>\n"
+    translator.page_cache[("en", "Ocean")] = FakePage(None, "Ocean", lead + "== History ==\nIt is old.\n")
+    _, record = translator.translate_page_with_record("Ocean", "en", "pt", "Oceano")
+    assert "<ref name=\"autoref5817e0e1\">Chase, p. 1.</ref>" in record.sections[0]["translation"]
+
+    translator.translator.texts.clear()
+    history = "== History ==\nIt is older.<ref>Chase, p. 1.</ref>\n"
+    translator.page_cache[("en", "Ocean")] = FakePage(None, "Ocean", lead + history, revision=2)
+    new_page, _ = translator.refresh_page(record)
+
+    assert translator.translator.texts == ["== History ==\nIt is older.<REF0>"]
+    assert new_page.text == record.sections[0]["translation"] + \
+        "PT(== History ==\nIt is older.<ref name=\"autoref5817e0e1\" />)\n"
@@ -1,8 +1,12 @@
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 from src.config.config import Config
 from src.wikipedia_wrapper.wikipedia_translator import WikipediaTranslator
-from src.utils.utils import read_input_file
+from src.utils.scheduler import CostEstimator, WorkScheduler
+from src.utils.utils import read_input_file, read_persisted_pages, read_priorities
+from src.wikipedia_wrapper.translation_record import TranslationRecord
 import logging
+import time
 
 
 if __name__ == "__main__":
@@ -10,16 +14,23 @@ if __name__ == "__main__":
                                      description='Reads from a file pages that need to be translated')
     parser.add_argument("input_file", type=str, help="Page to translate to another language")
     parser.add_argument("-verbose", type=bool, help="Whether to print or not", default=True)
-    parser.add_argument("-should_save", type=bool, help="Whether to print or not", default=False)
+    parser.add_argument("-should_save", action="store_true", help="Whether to publish the translated pages")
     parser.add_argument("-destination", type=str, help="folder destination, a file title.json will be created there",
                         default=None)
+    parser.add_argument("-refresh", action="store_true",
+                        help="Whether to refresh the pages already translated in the destination from their latest "
+                             "source revision")
+    parser.add_argument("-workers", type=int, default=1, help="Number of pages translated in parallel")
 
     # parse the arguments
     ARGS, _ = parser.parse_known_args()
+    logging.basicConfig(level=logging.INFO)
     input_file = ARGS.input_file
     verbose = ARGS.verbose
     should_save = ARGS.should_save
     destination = ARGS.destination
+    refresh = ARGS.refresh
+    workers = ARGS.workers
 
     # logging the arguments
     if verbose:
@@ -34,8 +45,39 @@ if __name__ == "__main__":
     # read the page titles to process
     page_titles = read_input_file(input_file)
 
-    # process each page titles
-    for source_page, source_language, target_page, target_language in page_titles:
+    # translation records of the pages already translated in the destination, to refresh them
+    records = {}
+    if refresh and destination is not None:
+        for persisted_page in read_persisted_pages(destination):
+            if "record" in persisted_page:
+                record = TranslationRecord.from_dict(persisted_page["record"])
+                records[(record.source_title, record.source_language, record.target_language)] = record
+
+    # split the pages to refresh from the new pages to translate
+    refresh_titles = [row for row in page_titles if (row[0], row[1], row[3]) in records]
+    page_titles = [row for row in page_titles if (row[0], row[1], row[3]) not in records]
+
+    # drop the pages that don't exist, are already translated or whose target title is taken, translate the missing
+    # target titles in batches and preload the content of the remaining pages
+    page_titles = wikipedia_translator.prepare_work_list(page_titles)
+    wikipedia_translator.preload_pages(page_titles)
+
+    # order the pages by estimated cost, longest first, by priority class and fairly between the target languages
+    priorities = read_priorities(input_file)
+    scheduler = WorkScheduler(CostEstimator(**config.config.get("cost_estimator", {})))
+    work_list = refresh_titles + page_titles
+    work_list = scheduler.schedule(work_list, wikipedia_translator.get_pages_metadata(work_list),
+                                   {item: priorities.get((item[0], item[1], item[3]), 0) for item in work_list})
+
+    def process_page(item):
+        """
+        Translate or refresh a page of the work list and persist it
+        :param item: tuple containing: (source page, source language, target page, target language)
+        :return:
+        """
+
+        source_page, source_language, target_page, target_language = item
+        start_time = time.perf_counter()
 
         # check if the languages given are supported in the translation
         if source_language not in config.config["supported_languages"]:
@@ -43,11 +85,43 @@ if __name__ == "__main__":
         if target_language not in config.config["supported_languages"]:
             logging.info(f"{target_language} is not a supported language")
 
-        # translate the page from source language to target language
-        translated_page = wikipedia_translator.translate_page(page_title=source_page, source_language=source_language,
-                                                              target_page_title=target_page,
-                                                              target_language=target_language)
+        # refresh the pages already translated, only their changed sections are translated again
+        record = records.get((source_page, source_language, target_language))
+        if record is not None:
+            translation = wikipedia_translator.refresh_page(record)
+        else:
+            # translate the page from source language to target language
+            translation = wikipedia_translator.translate_page_with_record(page_title=source_page,
+                                                                          source_language=source_language,
+                                                                          target_page_title=target_page,
+                                                                          target_language=target_language)
 
         # if a path to persist the translation is given, persist it.
-        if destination is not None:
-            WikipediaTranslator.persist_page(translated_page, destination)
+        if translation is not None and destination is not None:
+            translated_page, record = translation
+            WikipediaTranslator.persist_page(translated_page, destination, record)
+
+        scheduler.record_duration(item, time.perf_counter() - start_time)
+
+    # process each page titles, in the scheduled order, and wait until the translated pages are published even when a
+    # page fails
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for future in [executor.submit(process_page, item) for item in work_list]:
+                future.result()
+    finally:
+        wikipedia_translator.close()
+
+    # report the predicted against the actual durations to tune the cost estimator
+    report = scheduler.report()
+    if verbose:
+        for row in report["rows"]:
+            logging.info(f"{row['item'][0]} ({row['item'][3]}): predicted {row['predicted']:.1f}s, "
+                         f"actual {row['actual']:.1f}s")
+        logging.info(f"Total predicted {report['predicted']:.1f}s, actual {report['actual']:.1f}s, "
+                     f"ratio {report['ratio']}")
+
+    # report the usage of the translation requests, the cached tokens show how much of the prompts was reused
+    for translation_type, usage in wikipedia_translator.translator.usage_report().items():
+        logging.info(f"{translation_type}: {usage['requests']} requests, mean latency {usage['mean_seconds']:.2f}s, "
+                     f"{usage['cached_tokens']} of {usage['prompt_tokens']} prompt tokens cached")
@@ -0,0 +1,131 @@
+import argparse
+import logging
+import os
+import socket
+import threading
+import time
+
+from src.config.config import Config
+from src.utils.job_queue import JobQueue
+from src.utils.scheduler import CostEstimator, WorkScheduler
+from src.utils.utils import read_input_file, read_priorities
+from src.wikipedia_wrapper.wikipedia_translator import WikipediaTranslator
+
+
+def enqueue(wikipedia_translator: WikipediaTranslator, job_queue: JobQueue, config: Config, input_file: str):
+    """
+    Load a work file in the queue, after dropping the pages already translated and ordering them by estimated cost
+    :param wikipedia_translator: WikipediaTranslator object
+    :param job_queue: queue of the pages
+    :param config: configuration object
+    :param input_file: file with the pages to translate
+    :return:
+    """
+
+    page_titles = wikipedia_translator.prepare_work_list(read_input_file(input_file))
+
+    # pages of the same priority class are claimed in the scheduled order
+    priorities = read_priorities(input_file)
+    priorities = {item: priorities.get((item[0], item[1], item[3]), 0) for item in page_titles}
+    scheduler = WorkScheduler(CostEstimator(**config.config.get("cost_estimator", {})))
+    page_titles = scheduler.schedule(page_titles, wikipedia_translator.get_pages_metadata(page_titles), priorities)
+
+    added = job_queue.enqueue(page_titles, priorities)
+    logging.info(f"{added} pages added to the queue: {job_queue.counts()}")
+
+
+def work(wikipedia_translator: WikipediaTranslator, job_queue: JobQueue, destination: str, worker_id: str,
+         poll_interval: float):
+    """
+    Claim pages from the queue and translate them until the queue is empty
+    :param wikipedia_translator: WikipediaTranslator object
+    :param job_queue: queue of the pages
+    :param destination: folder destination of the translated pages, shared between the workers
+    :param worker_id: id of the worker
+    :param poll_interval: seconds to wait for the pages leased by other workers, that may be queued again
+    :return:
+    """
+
+    while True:
+        job = job_queue.claim(worker_id)
+        if job is None:
+            if job_queue.counts()["leased"] == 0:
+                break
+            time.sleep(poll_interval)
+            continue
+
+        job_id, (source_page, source_language, target_page, target_language) = job
+        logging.info(f"{worker_id} translating {source_page} to {target_language}")
+
+        # renew the lease while the page is translated
+        stop_heartbeat = threading.Event()
+
+        def heartbeat():
+            while not stop_heartbeat.wait(job_queue.lease_seconds / 3):
+                if not job_queue.heartbeat(job_id, worker_id):
+                    logging.warning(f"{worker_id} lost the lease of {source_page}")
+                    break
+
+        heartbeat_thread = threading.Thread(target=heartbeat, daemon=True)
+        heartbeat_thread.start()
+        try:
+            translation = wikipedia_translator.translate_page_with_record(page_title=source_page,
+                                                                          source_language=source_language,
+                                                                          target_page_title=target_page,
+                                                                          target_language=target_language)
+            if translation is not None and destination is not None:
+                translated_page, record = translation
+                WikipediaTranslator.persist_page(translated_page, destination, record)
+        except Exception as e:
+            logging.exception(f"{worker_id} failed to translate {source_page}")
+            job_queue.fail(job_id, worker_id, repr(e))
+        else:
+            job_queue.complete(job_id, worker_id)
+        finally:
+            stop_heartbeat.set()
+            heartbeat_thread.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog='Wikipedia Translator Queue',
+                                     description='Queue of pages to translate shared by many worker processes')
+    parser.add_argument("command", type=str, choices=["enqueue", "worker", "status"],
+                        help="enqueue: load a work file in the queue, worker: translate pages from the queue, "
+                             "status: count the pages by status")
+    parser.add_argument("input_file", type=str, nargs="?", help="Pages to translate, for the enqueue command")
+    parser.add_argument("-queue", type=str, help="SQLite file of the queue, on storage shared by the workers",
+                        default="queue.db")
+    parser.add_argument("-destination", type=str, help="folder destination, a file title.json will be created there",
+                        default=None)
+    parser.add_argument("-verbose", type=bool, help="Whether to print or not", default=False)
+    parser.add_argument("-should_save", action="store_true", help="Whether to publish the translated pages")
+    parser.add_argument("-lease", type=float, help="Seconds of the lease of a claimed page", default=300)
+    parser.add_argument("-max_attempts", type=int, help="Attempts of a page before it is marked as failed",
+                        default=3)
+    parser.add_argument("-poll_interval", type=float, help="Seconds between claims when the queue is busy",
+                        default=30)
+
+    # parse the arguments
+    ARGS, _ = parser.parse_known_args()
+    logging.basicConfig(level=logging.INFO)
+
+    job_queue = JobQueue(ARGS.queue, lease_seconds=ARGS.lease, max_attempts=ARGS.max_attempts)
+    if ARGS.command == "status":
+        print(job_queue.counts())
+    else:
+        # build the configuration and WikipediaTranslator objects
+        config = Config("src/config/config.json")
+        wikipedia_translator = WikipediaTranslator(config, config.config["supported_languages"], verbose=ARGS.verbose,
+                                                   should_save=ARGS.should_save)
+
+        if ARGS.command == "enqueue":
+            if ARGS.input_file is None:
+                parser.error("the enqueue command requires the input_file")
+            enqueue(wikipedia_translator, job_queue, config, ARGS.input_file)
+        else:
+            try:
+                work(wikipedia_translator, job_queue, ARGS.destination, f"{socket.gethostname()}-{os.getpid()}",
+                     ARGS.poll_interval)
+            finally:
+                wikipedia_translator.close()
+            logging.info(f"Translation usage: {wikipedia_translator.translator.usage_report()}")